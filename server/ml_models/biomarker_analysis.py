@@ -8,23 +8,152 @@ import tensorflow as tf
 from tensorflow.keras.models import Sequential
 from tensorflow.keras.layers import Dense, Dropout
 from tensorflow.keras.optimizers import Adam
-from tensorflow.keras.callbacks import EarlyStopping
+from tensorflow.keras.callbacks import Callback, EarlyStopping
 import joblib
+import json
 import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'ml_training'))
+from resource_governor import apply_resource_limits, current_rss_mb, set_tf_threads
+
+
+def configure_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Set TensorFlow's CPU thread pools so training doesn't oversubscribe the host
+    
+    Args:
+        intra_op_threads (int): Threads used inside a single op (0 or None keeps TF's default)
+        inter_op_threads (int): Ops that may run in parallel (0 or None keeps TF's default)
+    """
+    set_tf_threads(intra_op_threads, inter_op_threads)
+
+
+class EpochLogger(Callback):
+    """
+    Quiet Keras progress replacement: logs every `log_every` epochs and tracks epoch throughput
+    """
+    def __init__(self, log_every=10):
+        super().__init__()
+        self.log_every = log_every
+        self.epochs_run = 0
+        self.epochs_this_run = 0
+        self.start_time = None
+
+    def on_train_begin(self, logs=None):
+        self.start_time = time.perf_counter()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.epochs_run = epoch + 1
+        self.epochs_this_run += 1
+        if self.log_every and self.epochs_run % self.log_every == 0:
+            metrics = ', '.join(f"{k}={v:.4f}" for k, v in (logs or {}).items())
+            print(f"Epoch {self.epochs_run}: {metrics}")
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.start_time if self.start_time else 0.0
+
+
+class EpochCheckpoint(Callback):
+    """
+    Saves the model, the number of finished epochs and the early-stopping state after every
+    epoch so a resumed run continues exactly where the interrupted one stopped
+    """
+    def __init__(self, checkpoint_dir, early_stopping=None):
+        super().__init__()
+        self.checkpoint_dir = checkpoint_dir
+        self.early_stopping = early_stopping
+        # Keras 3 only restores optimizer state from its native format, which Keras 2 predates
+        extension = '.keras' if int(tf.keras.__version__.split('.')[0]) >= 3 else '.h5'
+        self.model_path = os.path.join(checkpoint_dir, 'neural_network_epoch' + extension)
+        self.epoch_path = os.path.join(checkpoint_dir, 'neural_network_epoch.json')
+        self.best_path = os.path.join(checkpoint_dir, 'neural_network_best.npz')
+        self.restored_state = None
+        self.restored_best_weights = None
+
+    def on_train_begin(self, logs=None):
+        # Runs after EarlyStopping.on_train_begin (it comes first in the callback list) has reset
+        # its counters, so the restored patience, best loss and best weights stick
+        stopping = self.early_stopping
+        if stopping is None or not self.restored_state:
+            return
+        # Keras 3 picks the comparison on the first on_epoch_end and resets `best` when it does;
+        # pick it now so that doesn't happen after the restore
+        if getattr(stopping, 'monitor_op', None) is None and hasattr(stopping, '_set_monitor_op'):
+            stopping._set_monitor_op()
+        stopping.wait = self.restored_state['wait']
+        stopping.best = self.restored_state['best']
+        stopping.best_epoch = self.restored_state['best_epoch']
+        if self.restored_best_weights is not None:
+            stopping.best_weights = self.restored_best_weights
+
+    def on_epoch_end(self, epoch, logs=None):
+        # Write to temporary files first so a kill mid-save never leaves a broken checkpoint
+        base, extension = os.path.splitext(self.model_path)
+        tmp_model = base + '.tmp' + extension
+        self.model.save(tmp_model)
+        os.replace(tmp_model, self.model_path)
+
+        state = {'epoch': epoch + 1}
+        # Keras 3 Dropout draws its masks from a seed generator the saved model doesn't include
+        seed_states = [layer.seed_generator.state.numpy().tolist()
+                       for layer in self.model.layers if hasattr(layer, 'seed_generator')]
+        if seed_states:
+            state['seed_states'] = seed_states
+        stopping = self.early_stopping
+        if stopping is not None:
+            state['early_stopping'] = {
+                'wait': int(stopping.wait),
+                'best': None if stopping.best is None else float(stopping.best),
+                'best_epoch': int(getattr(stopping, 'best_epoch', 0)),
+            }
+            # Best weights only change on an improving epoch
+            if stopping.best_weights is not None and stopping.wait == 0:
+                tmp_best = self.best_path + '.tmp.npz'
+                np.savez(tmp_best, *stopping.best_weights)
+                os.replace(tmp_best, self.best_path)
+        with open(self.epoch_path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(self.epoch_path + '.tmp', self.epoch_path)
+
+    def restore(self):
+        """
+        Returns (model, finished_epochs) from the last checkpoint, or (None, 0) if there is none.
+        Dropout seed state is restored here; early-stopping state is re-applied when training starts.
+        """
+        if not (os.path.exists(self.model_path) and os.path.exists(self.epoch_path)):
+            return None, 0
+        with open(self.epoch_path) as f:
+            state = json.load(f)
+        self.restored_state = state.get('early_stopping')
+        if self.restored_state and os.path.exists(self.best_path):
+            with np.load(self.best_path) as best:
+                self.restored_best_weights = [best[f'arr_{i}'] for i in range(len(best.files))]
+        model = tf.keras.models.load_model(self.model_path)
+        seed_layers = [layer for layer in model.layers if hasattr(layer, 'seed_generator')]
+        for layer, seed_state in zip(seed_layers, state.get('seed_states', [])):
+            layer.seed_generator.state.assign(np.asarray(seed_state, dtype=layer.seed_generator.state.dtype))
+        return model, state['epoch']
 
 class BiomarkerAnalyzer:
-    def __init__(self, model_type='both'):
+    def __init__(self, model_type='both', n_jobs=None):
         """
         Initialize the BiomarkerAnalyzer
         
         Args:
             model_type (str): Type of models to use ('sklearn', 'keras', or 'both')
+            n_jobs (int): Parallel jobs for the Random Forest (None uses a single core)
         """
         self.model_type = model_type
+        self.n_jobs = n_jobs
         self.scaler = StandardScaler()
         self.sklearn_models = {}
         self.keras_models = {}
         self.feature_importance = {}
+        self.training_stats = {}
+        self.model_info = {}
         
     def load_data(self, csv_path, target_column, biomarker_type):
         """
@@ -83,16 +212,39 @@ class BiomarkerAnalyzer:
         Args:
             data (dict): Dictionary containing training and testing data
         """
-        # Random Forest
+        self.train_random_forest(data)
+        self.train_gradient_boosting(data)
+
+    def train_random_forest(self, data):
+        """
+        Train the Random Forest model and store its feature importance
+        
+        Args:
+            data (dict): Dictionary containing training and testing data
+        """
         rf_model = RandomForestClassifier(
             n_estimators=100,
             max_depth=10,
-            random_state=42
+            random_state=42,
+            n_jobs=self.n_jobs
         )
         rf_model.fit(data['X_train'], data['y_train'])
         self.sklearn_models['random_forest'] = rf_model
         
-        # Gradient Boosting
+        # Store feature importance
+        self.feature_importance['random_forest'] = dict(zip(
+            data['feature_names'],
+            rf_model.feature_importances_
+        ))
+        return rf_model
+
+    def train_gradient_boosting(self, data):
+        """
+        Train the Gradient Boosting model
+        
+        Args:
+            data (dict): Dictionary containing training and testing data
+        """
         gb_model = GradientBoostingClassifier(
             n_estimators=100,
             learning_rate=0.1,
@@ -101,38 +253,56 @@ class BiomarkerAnalyzer:
         )
         gb_model.fit(data['X_train'], data['y_train'])
         self.sklearn_models['gradient_boosting'] = gb_model
-        
-        # Store feature importance
-        self.feature_importance['random_forest'] = dict(zip(
-            data['feature_names'],
-            rf_model.feature_importances_
-        ))
+        return gb_model
 
-    def train_keras_model(self, data):
+    def train_keras_model(self, data, epochs=100, batch_size=32, validation_fraction=0.2,
+                          log_every=10, intra_op_threads=None, inter_op_threads=None,
+                          checkpoint_dir=None, callbacks=None):
         """
         Train TensorFlow/Keras model
         
         Args:
             data (dict): Dictionary containing training and testing data
+            epochs (int): Maximum number of epochs (early stopping may end sooner)
+            batch_size (int): Training batch size
+            validation_fraction (float): Share of the training data held out for validation
+            log_every (int): Print metrics every N epochs (0 to stay silent)
+            intra_op_threads (int): TensorFlow intra-op thread count (None keeps the default)
+            inter_op_threads (int): TensorFlow inter-op thread count (None keeps the default)
+            checkpoint_dir (str): Save a checkpoint every epoch here and resume from it if present
+            callbacks (list): Extra Keras callbacks (e.g. progress reporting)
         """
+        configure_tf_threads(intra_op_threads, inter_op_threads)
+        
         # Get number of features and classes
         n_features = data['X_train'].shape[1]
         n_classes = len(np.unique(data['y_train']))
         
-        # Create model
-        model = Sequential([
-            Dense(64, activation='relu', input_shape=(n_features,)),
-            Dropout(0.3),
-            Dense(32, activation='relu'),
-            Dropout(0.2),
-            Dense(n_classes, activation='softmax')
-        ])
-        
-        # Compile model
-        model.compile(
-            optimizer=Adam(learning_rate=0.001),
-            loss='sparse_categorical_crossentropy',
-            metrics=['accuracy']
+        # Explicit validation set, sliced once instead of on every fit call
+        X_fit, X_val, y_fit, y_val = train_test_split(
+            np.asarray(data['X_train'], dtype=np.float32),
+            np.asarray(data['y_train']),
+            test_size=validation_fraction,
+            random_state=42
+        )
+        n_fit = len(X_fit)
+        steps_per_epoch = -(-n_fit // batch_size)
+        X_fit, y_fit = tf.constant(X_fit), tf.constant(y_fit)
+
+        def epoch_batches(epoch):
+            # The shuffle order depends only on the epoch number, so a resumed run sees the
+            # same batches as one that was never interrupted
+            seed = tf.stack([tf.constant(42, dtype=tf.int64), epoch])
+            order = tf.argsort(tf.random.stateless_uniform([n_fit], seed=seed))
+            return tf.data.Dataset.from_tensor_slices(
+                (tf.gather(X_fit, order), tf.gather(y_fit, order))
+            ).batch(batch_size)
+
+        val_ds = (
+            tf.data.Dataset.from_tensor_slices((X_val, y_val))
+            .batch(max(batch_size, 1024))
+            .cache()
+            .prefetch(tf.data.AUTOTUNE)
         )
         
         # Early stopping callback
@@ -142,17 +312,62 @@ class BiomarkerAnalyzer:
             restore_best_weights=True
         )
         
+        extra_callbacks = list(callbacks or [])
+        model, initial_epoch = None, 0
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+            checkpoint = EpochCheckpoint(checkpoint_dir, early_stopping)
+            model, initial_epoch = checkpoint.restore()
+            if model is not None:
+                print(f"Resuming Keras training from epoch {initial_epoch}")
+            extra_callbacks.append(checkpoint)
+        
+        if model is None:
+            # Create model
+            model = Sequential([
+                Dense(64, activation='relu', input_shape=(n_features,)),
+                Dropout(0.3),
+                Dense(32, activation='relu'),
+                Dropout(0.2),
+                Dense(n_classes, activation='softmax')
+            ])
+            
+            # Compile model
+            model.compile(
+                optimizer=Adam(learning_rate=0.001),
+                loss='sparse_categorical_crossentropy',
+                metrics=['accuracy']
+            )
+        
+        epoch_logger = EpochLogger(log_every=log_every)
+        
+        # One batch stream covering the remaining epochs, read by a single iterator
+        train_ds = (
+            tf.data.Dataset.range(initial_epoch, epochs)
+            .flat_map(epoch_batches)
+            .prefetch(tf.data.AUTOTUNE)
+        )
+        
         # Train model
         history = model.fit(
-            data['X_train'],
-            data['y_train'],
-            epochs=100,
-            batch_size=32,
-            validation_split=0.2,
-            callbacks=[early_stopping],
-            verbose=1
+            train_ds,
+            epochs=epochs,
+            steps_per_epoch=steps_per_epoch,
+            initial_epoch=initial_epoch,
+            validation_data=val_ds,
+            callbacks=[early_stopping, epoch_logger] + extra_callbacks,
+            verbose=0
         )
         
+        elapsed = epoch_logger.elapsed
+        self.training_stats['neural_network'] = {
+            'epochs': epoch_logger.epochs_run,
+            'seconds': elapsed,
+            'epochs_per_sec': epoch_logger.epochs_this_run / elapsed if elapsed else 0.0
+        }
+        print(f"Trained {epoch_logger.epochs_this_run} epochs in {elapsed:.2f}s "
+              f"({self.training_stats['neural_network']['epochs_per_sec']:.2f} epochs/sec)")
+        
         self.keras_models['neural_network'] = model
         return history
 
@@ -182,7 +397,10 @@ class BiomarkerAnalyzer:
         # Evaluate Keras model
         if self.model_type in ['keras', 'both']:
             for name, model in self.keras_models.items():
-                loss, accuracy = model.evaluate(data['X_test'], data['y_test'])
+                # Same array types as the tf.data validation set, so Keras 3 can reuse the test
+                # step traced during fit (a pandas Series reaches it with unknown rank)
+                loss, accuracy = model.evaluate(np.asarray(data['X_test'], dtype=np.float32),
+                                                np.asarray(data['y_test']))
                 y_pred = np.argmax(model.predict(data['X_test']), axis=1)
                 report = classification_report(data['y_test'], y_pred)
                 conf_matrix = confusion_matrix(data['y_test'], y_pred)
@@ -211,6 +429,8 @@ class BiomarkerAnalyzer:
         # Save Scikit-learn models
         if self.model_type in ['sklearn', 'both']:
             for name, model in self.sklearn_models.items():
+                if 'n_jobs' in model.get_params():
+                    model.set_params(n_jobs=None)
                 joblib.dump(model, os.path.join(output_dir, f'{name}_model.joblib'))
         
         # Save Keras models
@@ -223,6 +443,19 @@ class BiomarkerAnalyzer:
             joblib.dump(self.feature_importance, 
                        os.path.join(output_dir, 'feature_importance.joblib'))
 
+    def _load_artifact(self, name, path, loader):
+        # Record where each model came from and what it cost to bring into memory
+        rss_before = current_rss_mb()
+        start = time.perf_counter()
+        artifact = loader(path)
+        self.model_info[name] = {
+            'file': os.path.basename(path),
+            'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(path))),
+            'load_ms': (time.perf_counter() - start) * 1000,
+            'rss_mb': current_rss_mb() - rss_before,
+        }
+        return artifact
+
     def load_models(self, input_dir):
         """
         Load trained models and scaler
@@ -231,29 +464,69 @@ class BiomarkerAnalyzer:
             input_dir (str): Directory containing saved models
         """
         # Load scaler
-        self.scaler = joblib.load(os.path.join(input_dir, 'scaler.joblib'))
+        self.scaler = self._load_artifact('scaler', os.path.join(input_dir, 'scaler.joblib'), joblib.load)
         
         # Load Scikit-learn models
         if self.model_type in ['sklearn', 'both']:
             for model_name in ['random_forest', 'gradient_boosting']:
                 model_path = os.path.join(input_dir, f'{model_name}_model.joblib')
                 if os.path.exists(model_path):
-                    self.sklearn_models[model_name] = joblib.load(model_path)
+                    self.sklearn_models[model_name] = self._load_artifact(model_name, model_path, joblib.load)
         
         # Load Keras models
         if self.model_type in ['keras', 'both']:
             model_path = os.path.join(input_dir, 'neural_network_model.h5')
             if os.path.exists(model_path):
-                self.keras_models['neural_network'] = tf.keras.models.load_model(model_path)
+                self.keras_models['neural_network'] = self._load_artifact(
+                    'neural_network', model_path, tf.keras.models.load_model
+                )
         
         # Load feature importance
         importance_path = os.path.join(input_dir, 'feature_importance.joblib')
         if os.path.exists(importance_path):
             self.feature_importance = joblib.load(importance_path)
 
+    def warmup(self, batch_sizes=(1, 32, 1024)):
+        """
+        Run synthetic batches through every loaded model before serving, so sklearn/NumPy lazy
+        initialization, page faults on the forests and Keras graph tracing happen up front
+        
+        Args:
+            batch_sizes (tuple): Batch sizes to exercise (the Keras model traces one graph per shape)
+            
+        Returns:
+            dict: Readiness report with per-model version info, warmup time and memory
+        """
+        start = time.perf_counter()
+        n_features = len(self.scaler.mean_)
+        rng = np.random.default_rng(0)
+        
+        models = {**self.sklearn_models, **self.keras_models}
+        for name, model in models.items():
+            model_start = time.perf_counter()
+            for size in batch_sizes:
+                # Inputs are drawn in scaled space, i.e. around the training distribution
+                X = rng.standard_normal((size, n_features)).astype(np.float32)
+                if name in self.keras_models:
+                    model.predict(X, batch_size=size, verbose=0)
+                    model(X, training=False)
+                else:
+                    model.predict_proba(X)
+            self.model_info.setdefault(name, {})['warmup_ms'] = (time.perf_counter() - model_start) * 1000
+        
+        return {
+            'ready': bool(models),
+            'models': self.model_info,
+            'warmup_ms': (time.perf_counter() - start) * 1000,
+            'rss_mb': current_rss_mb(),
+        }
+
 def main():
+    # Training shares hosts with the scorers, so run within the training thread budget
+    limits = apply_resource_limits('training')
+    
     # Initialize the analyzer
-    analyzer = BiomarkerAnalyzer(model_type='both')
+    analyzer = BiomarkerAnalyzer(model_type='both', n_jobs=limits['n_jobs'])
     
     # Load and preprocess data
     data = analyzer.load_data(
@@ -267,7 +540,11 @@ def main():
         analyzer.train_sklearn_models(data)
         
         print("\nTraining Keras model...")
-        history = analyzer.train_keras_model(data)
+        history = analyzer.train_keras_model(
+            data,
+            intra_op_threads=limits['tf_intra_op_threads'],
+            inter_op_threads=limits['tf_inter_op_threads']
+        )
         
         print("\nEvaluating models...")
         results = analyzer.evaluate_models(data)
@@ -0,0 +1,454 @@
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import traceback
+import uuid
+from contextlib import contextmanager
+
+import joblib
+
+try:
+    import fcntl
+except ImportError:  # Windows: state updates are not serialized across processes
+    fcntl = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+TRAINING_DIR = os.path.join(BASE_DIR, '..', 'ml_training')
+DEFAULT_JOBS_DIR = os.path.join(BASE_DIR, 'training_jobs')
+
+ANALYZER_STAGES = ['prepare', 'random_forest', 'gradient_boosting', 'neural_network', 'evaluate', 'save']
+RESUMABLE = ('failed', 'cancelled', 'interrupted')
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _write_json(path, payload):
+    # Write-then-rename so readers never see a half-written state file; the temp name is
+    # per process so two writers never share one
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _raise_cancelled(signum, frame):
+    # cancel() sends SIGTERM; raising here lets the running stage record its time as cancelled.
+    # Later signals are ignored so they can't interrupt that bookkeeping
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    raise JobCancelled()
+
+
+def _pid_alive(pid):
+    if not pid:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class TrainingJobRunner:
+    def __init__(self, jobs_dir=DEFAULT_JOBS_DIR):
+        """
+        Run training pipelines as background processes with per-stage checkpoints
+
+        Args:
+            jobs_dir (str): Directory holding one sub-directory (state, log, checkpoints) per job
+        """
+        self.jobs_dir = jobs_dir
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def job_dir(self, job_id):
+        return os.path.join(self.jobs_dir, job_id)
+
+    def _state_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'state.json')
+
+    def _cancel_path(self, job_id):
+        return os.path.join(self.job_dir(job_id), 'cancel')
+
+    def load_state(self, job_id):
+        with open(self._state_path(job_id)) as f:
+            return json.load(f)
+
+    def save_state(self, state):
+        _write_json(self._state_path(state['id']), state)
+
+    @contextmanager
+    def edit_state(self, job_id):
+        """
+        Read-modify-write a job's state while holding its lock, so the submitting process and
+        the worker can't overwrite each other's changes
+        """
+        if not os.path.exists(self._state_path(job_id)):
+            raise ValueError(f"Unknown job {job_id}")
+        with open(os.path.join(self.job_dir(job_id), 'state.lock'), 'a') as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            state = self.load_state(job_id)
+            yield state
+            self.save_state(state)
+
+    def submit(self, pipeline, **params):
+        """
+        Create a job and start it in a background process
+
+        Args:
+            pipeline (str): 'biomarker_analysis' or 'script'
+            **params: Pipeline parameters (see run_biomarker_analysis / run_script)
+        """
+        if pipeline not in PIPELINES:
+            raise ValueError(f"Unknown pipeline '{pipeline}'. Choose from {sorted(PIPELINES)}")
+        job_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+        os.makedirs(os.path.join(self.job_dir(job_id), 'checkpoints'))
+        self.save_state({
+            'id': job_id,
+            'pipeline': pipeline,
+            'params': params,
+            'status': 'queued',
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'pid': None,
+            'stages': {},
+            'progress': 0.0,
+            'error': None,
+        })
+        self._spawn(job_id)
+        return job_id
+
+    def resume(self, job_id):
+        """
+        Restart a failed, cancelled or interrupted job; finished stages are loaded from checkpoints
+        """
+        state = self.status(job_id)
+        if state['status'] not in RESUMABLE:
+            raise ValueError(f"Job {job_id} is {state['status']}; only {', '.join(RESUMABLE)} jobs can resume")
+        if os.path.exists(self._cancel_path(job_id)):
+            os.remove(self._cancel_path(job_id))
+        with self.edit_state(job_id) as state:
+            state['status'] = 'queued'
+            state['error'] = None
+        self._spawn(job_id)
+
+    def _spawn(self, job_id):
+        log = open(os.path.join(self.job_dir(job_id), 'log.txt'), 'a')
+        # A new session lets cancel() stop the worker and any child it started in one go
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), '--jobs-dir', self.jobs_dir, 'run', job_id],
+            stdout=log, stderr=subprocess.STDOUT, stdin=subprocess.DEVNULL, start_new_session=True
+        )
+        log.close()
+        # Only the pid: the worker may already have marked the job running
+        with self.edit_state(job_id) as state:
+            state['pid'] = process.pid
+
+    def status(self, job_id):
+        """
+        Current job state; a 'running' job whose process is gone is reported as 'interrupted'
+        """
+        with self.edit_state(job_id) as state:
+            if state['status'] in ('queued', 'running') and state['pid'] and not _pid_alive(state['pid']):
+                state['status'] = 'interrupted'
+        return state
+
+    def list_jobs(self):
+        return [self.status(job_id) for job_id in sorted(os.listdir(self.jobs_dir))
+                if os.path.exists(self._state_path(job_id))]
+
+    def cancel(self, job_id):
+        """
+        Stop a job. Checkpoints written so far are kept, so the job can be resumed later.
+        """
+        state = self.status(job_id)
+        if state['status'] not in ('queued', 'running'):
+            return state
+        open(self._cancel_path(job_id), 'w').close()
+        # No pid yet means the worker hasn't started; it sees the cancel file before its first stage
+        if state['pid']:
+            try:
+                os.killpg(state['pid'], signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass
+        with self.edit_state(job_id) as state:
+            state['status'] = 'cancelled'
+            for stage in state['stages'].values():
+                if stage['status'] == 'running':
+                    stage['status'] = 'cancelled'
+        return state
+
+    def run(self, job_id):
+        """
+        Execute a job in the current process (called inside the background worker)
+        """
+        with self.edit_state(job_id) as state:
+            state['status'] = 'running'
+            state['pid'] = os.getpid()
+        context = JobContext(self, job_id)
+        signal.signal(signal.SIGTERM, _raise_cancelled)
+        try:
+            PIPELINES[state['pipeline']](context, **state['params'])
+        except JobCancelled:
+            context.finish('cancelled')
+        except Exception as e:
+            traceback.print_exc()
+            context.finish('failed', f"{type(e).__name__}: {str(e)}")
+        else:
+            context.finish('completed')
+
+
+class JobContext:
+    """
+    Handle given to pipelines for checkpoint paths, stage bookkeeping and cancellation checks
+    """
+    def __init__(self, runner, job_id):
+        self.runner = runner
+        self.job_id = job_id
+        self.checkpoint_dir = os.path.join(runner.job_dir(job_id), 'checkpoints')
+
+    def checkpoint(self, name):
+        return os.path.join(self.checkpoint_dir, name)
+
+    def cancelled(self):
+        return os.path.exists(self.runner._cancel_path(self.job_id))
+
+    def stage_done(self, name):
+        return self.runner.load_state(self.job_id)['stages'].get(name, {}).get('status') == 'completed'
+
+    def update(self, **fields):
+        with self.runner.edit_state(self.job_id) as state:
+            state.update(fields)
+
+    def set_stage_progress(self, name, fraction, stage_names):
+        with self.runner.edit_state(self.job_id) as state:
+            done = sum(1 for s in stage_names if state['stages'].get(s, {}).get('status') == 'completed')
+            state['stages'].setdefault(name, {})['progress'] = fraction
+            state['progress'] = (done + fraction) / len(stage_names)
+
+    def run_stage(self, name, stage_names, fn):
+        """
+        Run one stage unless a previous attempt already completed it, recording its duration
+        """
+        if self.stage_done(name):
+            print(f"Stage {name}: already completed, loading checkpoint")
+            return False
+        if self.cancelled():
+            raise JobCancelled()
+
+        with self.runner.edit_state(self.job_id) as state:
+            previous = state['stages'].get(name, {})
+            state['stages'][name] = {
+                'status': 'running',
+                'started': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                'attempts': previous.get('attempts', 0) + 1,
+            }
+        print(f"Stage {name}: started")
+
+        start = time.perf_counter()
+        try:
+            fn()
+        except JobCancelled:
+            self._end_stage(name, 'cancelled', time.perf_counter() - start, stage_names)
+            raise
+        except Exception:
+            self._end_stage(name, 'failed', time.perf_counter() - start, stage_names)
+            raise
+        self._end_stage(name, 'completed', time.perf_counter() - start, stage_names)
+        print(f"Stage {name}: completed")
+        return True
+
+    def _end_stage(self, name, status, duration, stage_names):
+        with self.runner.edit_state(self.job_id) as state:
+            stage = state['stages'][name]
+            stage['status'] = status
+            stage['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+            stage['duration_s'] = stage.get('duration_s', 0.0) + duration
+            done = sum(1 for s in stage_names if state['stages'].get(s, {}).get('status') == 'completed')
+            state['progress'] = done / len(stage_names)
+
+    def finish(self, status, error=None):
+        with self.runner.edit_state(self.job_id) as state:
+            # cancel() may already have marked the job; don't overwrite that with 'failed'
+            if self.cancelled():
+                status = 'cancelled'
+            state['status'] = status
+            state['error'] = error
+            state['finished'] = time.strftime('%Y-%m-%dT%H:%M:%S')
+
+
+def run_biomarker_analysis(context, csv_path, target_column='Diagnosis', biomarker_type='blood',
+                           model_type='both', output_dir='saved_models', epochs=100):
+    """
+    BiomarkerAnalyzer main() as a resumable pipeline: every stage's output is checkpointed
+    """
+    from biomarker_analysis import BiomarkerAnalyzer, apply_resource_limits
+    from tensorflow.keras.callbacks import Callback
+
+    limits = apply_resource_limits('training')
+    analyzer = BiomarkerAnalyzer(model_type=model_type, n_jobs=limits['n_jobs'])
+    stages = [s for s in ANALYZER_STAGES
+              if not (model_type == 'sklearn' and s == 'neural_network')
+              and not (model_type == 'keras' and s in ('random_forest', 'gradient_boosting'))]
+    data = {}
+
+    def prepare():
+        loaded = analyzer.load_data(csv_path=csv_path, target_column=target_column, biomarker_type=biomarker_type)
+        if loaded is None:
+            raise RuntimeError(f"Could not load {csv_path}")
+        joblib.dump(loaded, context.checkpoint('data.joblib'))
+        joblib.dump(analyzer.scaler, context.checkpoint('scaler.joblib'))
+        data.update(loaded)
+
+    if not context.run_stage('prepare', stages, prepare):
+        data.update(joblib.load(context.checkpoint('data.joblib')))
+        analyzer.scaler = joblib.load(context.checkpoint('scaler.joblib'))
+
+    for name, train in [('random_forest', analyzer.train_random_forest),
+                        ('gradient_boosting', analyzer.train_gradient_boosting)]:
+        if name not in stages:
+            continue
+
+        def fit(name=name, train=train):
+            model = train(data)
+            joblib.dump(model, context.checkpoint(f'{name}.joblib'))
+
+        if not context.run_stage(name, stages, fit):
+            model = joblib.load(context.checkpoint(f'{name}.joblib'))
+            analyzer.sklearn_models[name] = model
+            if name == 'random_forest':
+                analyzer.feature_importance[name] = dict(zip(data['feature_names'], model.feature_importances_))
+
+    if 'neural_network' in stages:
+        class JobProgress(Callback):
+            def on_epoch_end(self, epoch, logs=None):
+                context.set_stage_progress('neural_network', (epoch + 1) / epochs, stages)
+                if context.cancelled():
+                    self.model.stop_training = True
+
+        def fit_keras():
+            analyzer.train_keras_model(
+                data,
+                epochs=epochs,
+                intra_op_threads=limits['tf_intra_op_threads'],
+                inter_op_threads=limits['tf_inter_op_threads'],
+                checkpoint_dir=context.checkpoint('keras'),
+                callbacks=[JobProgress()]
+            )
+            if context.cancelled():
+                raise JobCancelled()
+            analyzer.keras_models['neural_network'].save(context.checkpoint('neural_network.h5'))
+
+        if not context.run_stage('neural_network', stages, fit_keras):
+            import tensorflow as tf
+            analyzer.keras_models['neural_network'] = tf.keras.models.load_model(context.checkpoint('neural_network.h5'))
+
+    def evaluate():
+        results = analyzer.evaluate_models(data)
+        for model_name, model_results in results.items():
+            print(f"\nResults for {model_name}:")
+            print(f"Accuracy: {model_results['accuracy']:.4f}")
+            print("\nClassification Report:")
+            print(model_results['classification_report'])
+        context.update(results={name: {'accuracy': float(r['accuracy'])} for name, r in results.items()})
+
+    context.run_stage('evaluate', stages, evaluate)
+    context.run_stage('save', stages, lambda: analyzer.save_models(output_dir))
+
+
+def run_script(context, script, cwd=None):
+    """
+    Run one of the train_*.py scripts as a single-stage job
+
+    Args:
+        script (str): Script name in ml_training (e.g. 'train_diabetes.py') or a path
+        cwd (str): Working directory (the scripts read their CSV relative to it)
+    """
+    path = script if os.path.isabs(script) else os.path.join(TRAINING_DIR, script)
+
+    def train():
+        proc = subprocess.run([sys.executable, path], cwd=cwd)
+        if context.cancelled():
+            raise JobCancelled()
+        if proc.returncode != 0:
+            raise RuntimeError(f"{script} exited with code {proc.returncode}")
+
+    context.run_stage('train', ['train'], train)
+
+
+PIPELINES = {
+    'biomarker_analysis': run_biomarker_analysis,
+    'script': run_script,
+}
+
+
+def _print_state(state):
+    print(f"{state['id']}  {state['pipeline']:<18} {state['status']:<11} {state['progress']:.0%}")
+    for name, stage in state['stages'].items():
+        duration = f"{stage['duration_s']:.1f}s" if 'duration_s' in stage else '-'
+        print(f"    {name:<18} {stage['status']:<11} {duration}")
+    if state.get('error'):
+        print(f"    error: {state['error']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Background training jobs with checkpointing")
+    parser.add_argument('--jobs-dir', default=DEFAULT_JOBS_DIR, help="Where job state and checkpoints live")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    submit = sub.add_parser('submit', help="Start a new background job")
+    submit.add_argument('pipeline', choices=sorted(PIPELINES))
+    submit.add_argument('--csv-path', default='diabetes_data.csv', help="biomarker_analysis: dataset")
+    submit.add_argument('--target-column', default='Diagnosis', help="biomarker_analysis: label column")
+    submit.add_argument('--model-type', default='both', choices=['sklearn', 'keras', 'both'])
+    submit.add_argument('--output-dir', default='saved_models', help="biomarker_analysis: where to save models")
+    submit.add_argument('--epochs', type=int, default=100, help="biomarker_analysis: Keras epochs")
+    submit.add_argument('--script', help="script: train_*.py to run")
+
+    for command in ('status', 'cancel', 'resume', 'run'):
+        command_parser = sub.add_parser(command)
+        command_parser.add_argument('job_id', nargs='?' if command == 'status' else None)
+
+    args = parser.parse_args()
+    runner = TrainingJobRunner(args.jobs_dir)
+
+    try:
+        if args.command == 'submit':
+            if args.pipeline == 'script':
+                if not args.script:
+                    parser.error("--script is required for the script pipeline")
+                params = {'script': args.script, 'cwd': os.getcwd()}
+            else:
+                params = {
+                    'csv_path': os.path.abspath(args.csv_path),
+                    'target_column': args.target_column,
+                    'model_type': args.model_type,
+                    'output_dir': os.path.abspath(args.output_dir),
+                    'epochs': args.epochs,
+                }
+            job_id = runner.submit(args.pipeline, **params)
+            print(f"Submitted job {job_id}")
+        elif args.command == 'status':
+            states = [runner.status(args.job_id)] if args.job_id else runner.list_jobs()
+            for state in states:
+                _print_state(state)
+        elif args.command == 'cancel':
+            _print_state(runner.cancel(args.job_id))
+        elif args.command == 'resume':
+            runner.resume(args.job_id)
+            print(f"Resumed job {args.job_id}")
+        elif args.command == 'run':
+            runner.run(args.job_id)
+    except ValueError as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from binned_forest import BinnedForest
+from predict_diabetes import analyze_biomarkers, load_model_and_scaler, predict_diabetes
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+DEFAULT_DATA_PATH = os.path.join(BASE_DIR, '..', '..', 'diabetes_data.csv')
+FEATURE_NAMES = ['BMI', 'Chol', 'TG', 'HDL', 'LDL', 'Cr', 'BUN']
+
+# Metrics ending in these suffixes are "higher is better"; everything else is a cost
+HIGHER_IS_BETTER = ('_rows_per_s', '_per_sec')
+
+SAMPLE_CASE = {
+    "BMI": 27,
+    "Chol": 5.5,
+    "TG": 1.8,
+    "HDL": 1.2,
+    "LDL": 3.5,
+    "Cr": 95,
+    "BUN": 6.5
+}
+
+
+def load_feature_frame(data_path=DEFAULT_DATA_PATH):
+    df = pd.read_csv(data_path)
+    return df[FEATURE_NAMES + ['Diagnosis']]
+
+
+def synthesize_rows(df, n_rows, seed=42):
+    """
+    Scale up the real dataset by resampling rows and adding small per-column noise
+
+    Args:
+        df (DataFrame): Source rows with the diabetes feature columns
+        n_rows (int): Number of rows to generate
+        seed (int): Random seed so repeated runs see the same data
+    """
+    rng = np.random.default_rng(seed)
+    base = df[FEATURE_NAMES].to_numpy(dtype=np.float64)
+    idx = rng.integers(0, len(base), size=n_rows)
+    noise = rng.normal(0.0, 0.05, size=(n_rows, len(FEATURE_NAMES))) * base.std(axis=0)
+    rows = np.clip(base[idx] + noise, base.min(axis=0), base.max(axis=0))
+    return rows
+
+
+def summarize(samples_ms):
+    samples = np.asarray(samples_ms, dtype=np.float64)
+    return {
+        'mean_ms': float(samples.mean()),
+        'p50_ms': float(np.percentile(samples, 50)),
+        'p95_ms': float(np.percentile(samples, 95)),
+        'min_ms': float(samples.min()),
+    }
+
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000, result
+
+
+def bench_cold_start(repeat):
+    # Mirrors how the Node server invokes the scorer: one process per request
+    script = os.path.join(BASE_DIR, 'predict_diabetes.py')
+    payload = json.dumps(SAMPLE_CASE)
+    samples = []
+    for _ in range(repeat):
+        elapsed, proc = timed(
+            subprocess.run, [sys.executable, script],
+            input=payload, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            raise RuntimeError(f"predict_diabetes.py failed: {proc.stderr.strip()}")
+        samples.append(elapsed)
+    return summarize(samples)
+
+
+def bench_warm(repeat):
+    first_ms, _ = timed(predict_diabetes, SAMPLE_CASE)
+    samples = [timed(predict_diabetes, SAMPLE_CASE)[0] for _ in range(repeat)]
+    return {'first_call_ms': first_ms, **summarize(samples)}
+
+
+def bench_batch(df, sizes, repeat):
+    model, scaler = load_model_and_scaler()
+    results = {}
+    for size in sizes:
+        X = synthesize_rows(df, size)
+        samples = []
+        for _ in range(repeat):
+            elapsed, _ = timed(lambda: model.predict_proba(scaler.transform(X)))
+            samples.append(elapsed)
+        stats = summarize(samples)
+        stats['throughput_rows_per_s'] = size / (stats['p50_ms'] / 1000)
+        results[str(size)] = stats
+    return results
+
+
+def bench_binned(df, sizes, repeat):
+    model, scaler = load_model_and_scaler()
+    build_ms, forest = timed(BinnedForest, model)
+    results = {'build_ms': build_ms}
+    for size in sizes:
+        X_scaled = scaler.transform(synthesize_rows(df, size))
+        bin_ms, bins = timed(forest.bin, X_scaled)
+        samples = [timed(forest.predict_proba_binned, bins)[0] for _ in range(repeat)]
+        stats = summarize(samples)
+        stats['bin_ms'] = bin_ms
+        stats['input_mb'] = bins.nbytes / 2**20
+        stats['throughput_rows_per_s'] = size / (stats['p50_ms'] / 1000)
+        results[str(size)] = stats
+    return results
+
+
+def bench_rules(df, n_rows):
+    X = synthesize_rows(df, n_rows)
+    rows = [dict(zip(FEATURE_NAMES, row)) for row in X]
+    elapsed, _ = timed(lambda: [analyze_biomarkers(row) for row in rows])
+    return {
+        'per_row_us': elapsed * 1000 / n_rows,
+        'throughput_rows_per_s': n_rows / (elapsed / 1000),
+    }
+
+
+def bench_artifacts():
+    results = {}
+    for name in ['diabetes_model', 'diabetes_scaler']:
+        path = os.path.join(MODELS_DIR, f'{name}.joblib')
+        tracemalloc.start()
+        elapsed, _ = timed(joblib.load, path)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[name] = {
+            'load_ms': elapsed,
+            'peak_alloc_mb': peak / 2**20,
+            'file_size_mb': os.path.getsize(path) / 2**20,
+        }
+    return results
+
+
+def bench_training(data_path):
+    sys.path.insert(0, os.path.join(BASE_DIR, '..', 'ml_models'))
+    try:
+        from biomarker_analysis import BiomarkerAnalyzer
+    except ImportError as e:
+        return {'skipped': f"biomarker_analysis unavailable: {str(e)}"}
+
+    analyzer = BiomarkerAnalyzer(model_type='both')
+    data = analyzer.load_data(csv_path=data_path, target_column='Diagnosis', biomarker_type='blood')
+    if data is None:
+        return {'skipped': f"could not load {data_path}"}
+
+    results = {}
+    for name, train in [
+        ('random_forest', analyzer.train_random_forest),
+        ('gradient_boosting', analyzer.train_gradient_boosting),
+        ('neural_network', analyzer.train_keras_model),
+    ]:
+        elapsed, _ = timed(train, data)
+        results[name] = {'train_s': elapsed / 1000}
+        if name in analyzer.training_stats:
+            results[name]['epochs_per_sec'] = analyzer.training_stats[name]['epochs_per_sec']
+    return results
+
+
+def flatten(results, prefix=''):
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    """
+    Compare every numeric metric against a stored baseline run
+
+    Args:
+        results (dict): Metrics from the current run
+        baseline (dict): Metrics from the baseline run
+        tolerance (float): Allowed relative slowdown before a metric counts as a regression
+    """
+    current = flatten(results['metrics'])
+    previous = flatten(baseline['metrics'])
+    comparison = {}
+    regressions = []
+    for name, value in current.items():
+        if name not in previous or previous[name] == 0:
+            continue
+        ratio = value / previous[name]
+        if name.endswith(HIGHER_IS_BETTER):
+            regressed = ratio < 1 - tolerance
+        else:
+            regressed = ratio > 1 + tolerance
+        comparison[name] = {'baseline': previous[name], 'current': value, 'ratio': ratio}
+        if regressed:
+            regressions.append(name)
+    return comparison, regressions
+
+
+def run_benchmarks(args):
+    df = load_feature_frame(args.data)
+    sizes = [int(size) for size in args.sizes.split(',')]
+    skip = set(args.skip.split(',')) if args.skip else set()
+
+    metrics = {}
+    if 'cold' not in skip:
+        print("Measuring cold-start latency...", file=sys.stderr)
+        metrics['cold_start'] = bench_cold_start(args.cold_repeat)
+    if 'warm' not in skip:
+        print("Measuring warm latency...", file=sys.stderr)
+        metrics['warm'] = bench_warm(args.repeat)
+    if 'batch' not in skip:
+        print(f"Measuring batch throughput at {sizes} rows...", file=sys.stderr)
+        metrics['batch'] = bench_batch(df, sizes, args.batch_repeat)
+    if 'binned' not in skip:
+        print(f"Measuring binned re-scoring at {sizes} rows...", file=sys.stderr)
+        metrics['binned'] = bench_binned(df, sizes, args.batch_repeat)
+    if 'rules' not in skip:
+        print("Measuring rule evaluation cost...", file=sys.stderr)
+        metrics['rules'] = bench_rules(df, args.rule_rows)
+    if 'artifacts' not in skip:
+        print("Measuring artifact load time and memory...", file=sys.stderr)
+        metrics['artifacts'] = bench_artifacts()
+    if 'training' not in skip:
+        print("Measuring BiomarkerAnalyzer training time...", file=sys.stderr)
+        metrics['training'] = bench_training(args.data)
+
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'numpy': np.__version__,
+        },
+        'metrics': metrics,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the diabetes scorer and BiomarkerAnalyzer training")
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Path to diabetes_data.csv")
+    parser.add_argument('--sizes', default='1,100,10000,1000000', help="Comma-separated batch sizes")
+    parser.add_argument('--repeat', type=int, default=20, help="Repetitions for warm latency")
+    parser.add_argument('--cold-repeat', type=int, default=5, help="Repetitions for cold-start latency")
+    parser.add_argument('--batch-repeat', type=int, default=3, help="Repetitions per batch size")
+    parser.add_argument('--rule-rows', type=int, default=10000, help="Rows used for rule evaluation")
+    parser.add_argument('--skip', default='', help="Comma-separated sections to skip (cold,warm,batch,binned,rules,artifacts,training)")
+    parser.add_argument('--output', default='benchmark_results.json', help="Where to write the JSON results")
+    parser.add_argument('--baseline', help="Baseline JSON to compare against")
+    parser.add_argument('--save-baseline', help="Also write this run as a baseline to the given path")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed relative regression (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    results = run_benchmarks(args)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison, regressions = compare_to_baseline(results, baseline, args.tolerance)
+        results['comparison'] = comparison
+        results['regressions'] = regressions
+        if regressions:
+            print(f"Regressions beyond {args.tolerance:.0%}: {', '.join(regressions)}", file=sys.stderr)
+            exit_code = 1
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to: {args.output}", file=sys.stderr)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to: {args.save_baseline}", file=sys.stderr)
+
+    sys.exit(exit_code)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+import argparse
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+
+class BinnedForest:
+    """
+    Compact, exact binned inputs for a fitted RandomForestClassifier, for offline re-scoring
+
+    Each feature's split thresholds (over all trees) are sorted once, and an input is stored as
+    the number of thresholds strictly below it: uint8 when every feature has at most 255
+    distinct thresholds, uint16 otherwise. Decoding maps each bin to a float32 value on the same
+    side of every threshold as the inputs in that bin, so the unmodified forest gives the same
+    probabilities as on the original features.
+
+    This is a storage format, not a faster scorer: re-scoring costs predict_proba plus the decode.
+    """
+    def __init__(self, model):
+        self.model = model
+        self.n_features = model.n_features_in_
+        self.classes_ = model.classes_
+        trees = [est.tree_ for est in model.estimators_]
+
+        self.edges = []
+        self.representatives = []
+        for f in range(self.n_features):
+            thresholds = [tree.threshold[tree.feature == f] for tree in trees]
+            edges = np.unique(np.concatenate(thresholds))
+            self.edges.append(edges)
+            # Trees send float32 x left when x <= threshold, so bin k holds the float32 values in
+            # (edges[k-1], edges[k]]; the largest of them stands in for the bin, and the last bin
+            # uses the first float32 above every threshold
+            upper = edges.astype(np.float32)
+            above = upper.astype(np.float64) > edges
+            upper[above] = np.nextafter(upper[above], np.float32(-np.inf))
+            last = np.float32(edges[-1]) if len(edges) else np.float32(0.0)
+            if len(edges) and last <= edges[-1]:
+                last = np.nextafter(last, np.float32(np.inf))
+            self.representatives.append(np.append(upper, last))
+        max_bins = max(len(edges) for edges in self.edges) + 1
+        self.bin_dtype = np.uint8 if max_bins <= 256 else np.uint16
+
+    def bin(self, X_scaled):
+        """
+        Quantize scaled features into bin indices (do this once and keep the bins)
+
+        Args:
+            X_scaled (ndarray): Scaled features, shape (n_rows, n_features)
+        """
+        # Trees see float32 inputs, so bin the same float32 values
+        X = np.asarray(X_scaled, dtype=np.float32).astype(np.float64)
+        bins = np.empty(X.shape, dtype=self.bin_dtype)
+        for f in range(self.n_features):
+            bins[:, f] = np.searchsorted(self.edges[f], X[:, f], side='left')
+        return bins
+
+    def decode(self, bins):
+        """
+        float32 features that every tree routes exactly like the inputs that were binned
+
+        Args:
+            bins (ndarray): Output of bin()
+        """
+        X = np.empty(bins.shape, dtype=np.float32)
+        for f in range(self.n_features):
+            X[:, f] = self.representatives[f][bins[:, f]]
+        return X
+
+    def predict_proba_binned(self, bins, chunk_size=65536):
+        """
+        Class probabilities from pre-binned inputs
+
+        Args:
+            bins (ndarray): Output of bin()
+            chunk_size (int): Rows decoded to float32 at a time
+        """
+        if len(bins) == 0:
+            return np.empty((0, len(self.classes_)))
+        return np.concatenate([
+            self.model.predict_proba(self.decode(bins[start:start + chunk_size]))
+            for start in range(0, len(bins), chunk_size)
+        ])
+
+    def predict_proba(self, X_scaled, chunk_size=65536):
+        return self.predict_proba_binned(self.bin(X_scaled), chunk_size)
+
+    def predict(self, X_scaled):
+        return self.classes_[np.argmax(self.predict_proba(X_scaled), axis=1)]
+
+
+def main():
+    from predict_diabetes import FEATURE_NAMES, load_model_and_scaler
+
+    parser = argparse.ArgumentParser(description="Re-score a CSV of biomarker panels from compact binned inputs")
+    parser.add_argument('input', help="CSV with the diabetes feature columns")
+    parser.add_argument('--output', help="Write the input plus a 'probability' column here")
+    parser.add_argument('--chunk-size', type=int, default=65536, help="Rows decoded at a time")
+    parser.add_argument('--verify', action='store_true', help="Also run sklearn's float path and check the results match")
+    args = parser.parse_args()
+
+    model, scaler = load_model_and_scaler()
+    df = pd.read_csv(args.input)
+    X_scaled = scaler.transform(df[FEATURE_NAMES].to_numpy(dtype=np.float64))
+
+    start = time.perf_counter()
+    forest = BinnedForest(model)
+    build_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bins = forest.bin(X_scaled)
+    bin_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    proba = forest.predict_proba_binned(bins, args.chunk_size)
+    score_s = time.perf_counter() - start
+
+    print(f"Binned {len(df)} rows into {bins.dtype} ({bins.nbytes / 2**20:.1f} MB vs "
+          f"{X_scaled.nbytes / 2**20:.1f} MB float64) in {bin_s:.2f}s; edges built in {build_s:.2f}s", file=sys.stderr)
+    print(f"Scored in {score_s:.2f}s ({len(df) / score_s:.0f} rows/s)", file=sys.stderr)
+
+    if args.verify:
+        start = time.perf_counter()
+        expected = model.predict_proba(X_scaled)
+        float_s = time.perf_counter() - start
+        mismatches = int((proba != expected).any(axis=1).sum())
+        print(f"Float path: {float_s:.2f}s; rows differing: {mismatches}", file=sys.stderr)
+        if mismatches:
+            sys.exit(1)
+
+    if args.output:
+        df['probability'] = proba[:, list(forest.classes_).index(1) if 1 in forest.classes_ else -1]
+        df.to_csv(args.output, index=False)
+
+
+if __name__ == "__main__":
+    main()
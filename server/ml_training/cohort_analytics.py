@@ -0,0 +1,444 @@
+import argparse
+import copy
+import json
+import math
+import sys
+from collections import Counter, defaultdict
+
+RISK_LEVELS = ['Minimal', 'Low', 'Moderate', 'High', 'Very High']
+
+# Fixed histogram ranges for the biomarkers we score; anything else uses GENERIC_RANGE
+HISTOGRAM_RANGES = {
+    'BMI': (10.0, 60.0),
+    'Chol': (0.0, 12.0),
+    'TG': (0.0, 10.0),
+    'HDL': (0.0, 4.0),
+    'LDL': (0.0, 10.0),
+    'Cr': (0.0, 400.0),
+    'BUN': (0.0, 30.0),
+    'riskValue': (0.0, 100.0),
+}
+GENERIC_RANGE = (0.0, 1000.0)
+HISTOGRAM_BINS = 50
+
+
+def _by_risk_level(levels):
+    # Least to most severe; levels outside RISK_LEVELS go last
+    order = {level: i for i, level in enumerate(RISK_LEVELS)}
+    return dict(sorted(levels.items(), key=lambda item: (order.get(item[0], len(order)), item[0])))
+
+
+class RunningStats:
+    """
+    Welford mean/variance with min/max; two instances merge exactly (Chan et al.)
+    """
+    def __init__(self, count=0, mean=0.0, m2=0.0, min=None, max=None):
+        self.count = count
+        self.mean = mean
+        self.m2 = m2
+        self.min = min
+        self.max = max
+
+    def update(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (value - self.mean)
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.__dict__.update(other.to_dict())
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def to_dict(self):
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2, 'min': self.min, 'max': self.max}
+
+
+class FixedHistogram:
+    """
+    Equal-width bins over a fixed range plus underflow/overflow counts; like numpy.histogram,
+    the last bin includes the upper edge, so capped scores (riskValue 100) aren't overflow
+    """
+    def __init__(self, low, high, bins=HISTOGRAM_BINS, counts=None):
+        self.low = low
+        self.high = high
+        self.bins = bins
+        # counts[0] is underflow, counts[-1] is overflow
+        self.counts = counts or [0] * (bins + 2)
+
+    def update(self, value):
+        if value < self.low:
+            index = 0
+        elif value > self.high:
+            index = self.bins + 1
+        else:
+            index = 1 + min(int((value - self.low) / (self.high - self.low) * self.bins), self.bins - 1)
+        self.counts[index] += 1
+
+    def merge(self, other):
+        if (self.low, self.high, self.bins) != (other.low, other.high, other.bins):
+            raise ValueError("Cannot merge histograms with different bin edges")
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        return self
+
+    def to_dict(self):
+        return {'low': self.low, 'high': self.high, 'bins': self.bins, 'counts': self.counts}
+
+
+class QuantileSketch:
+    """
+    DDSketch-style log-bucketed quantile sketch: O(1) updates, exact merges, and every
+    quantile estimate within `relative_accuracy` of a true sample value
+    """
+    def __init__(self, relative_accuracy=0.01, positive=None, negative=None, zeros=0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.positive = Counter(positive or {})
+        self.negative = Counter(negative or {})
+        self.zeros = zeros
+
+    def _key(self, value):
+        return math.ceil(math.log(value) / self.log_gamma)
+
+    def _value(self, key):
+        return 2 * self.gamma ** key / (self.gamma + 1)
+
+    @property
+    def count(self):
+        return sum(self.positive.values()) + sum(self.negative.values()) + self.zeros
+
+    def update(self, value):
+        if value > 0:
+            self.positive[self._key(value)] += 1
+        elif value < 0:
+            self.negative[self._key(-value)] += 1
+        else:
+            self.zeros += 1
+
+    def merge(self, other):
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        self.positive.update(other.positive)
+        self.negative.update(other.negative)
+        self.zeros += other.zeros
+        return self
+
+    def quantile(self, q):
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+        seen = 0
+        for key in sorted(self.negative, reverse=True):
+            seen += self.negative[key]
+            if seen > rank:
+                return -self._value(key)
+        seen += self.zeros
+        if seen > rank:
+            return 0.0
+        for key in sorted(self.positive):
+            seen += self.positive[key]
+            if seen > rank:
+                return self._value(key)
+        return self._value(max(self.positive))
+
+    def to_dict(self):
+        return {
+            'relative_accuracy': self.relative_accuracy,
+            'positive': {str(k): v for k, v in self.positive.items()},
+            'negative': {str(k): v for k, v in self.negative.items()},
+            'zeros': self.zeros,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(
+            data['relative_accuracy'],
+            {int(k): v for k, v in data['positive'].items()},
+            {int(k): v for k, v in data['negative'].items()},
+            data['zeros'],
+        )
+
+
+class MetricAggregate:
+    """
+    Stats, histogram and quantile sketch for one (disease, biomarker) stream
+    """
+    def __init__(self, name, stats=None, histogram=None, sketch=None):
+        low, high = HISTOGRAM_RANGES.get(name, GENERIC_RANGE)
+        self.stats = stats or RunningStats()
+        self.histogram = histogram or FixedHistogram(low, high)
+        self.sketch = sketch or QuantileSketch()
+
+    def update(self, value):
+        self.stats.update(value)
+        self.histogram.update(value)
+        self.sketch.update(value)
+
+    def merge(self, other):
+        self.stats.merge(other.stats)
+        self.histogram.merge(other.histogram)
+        self.sketch.merge(other.sketch)
+        return self
+
+    def to_dict(self):
+        return {'stats': self.stats.to_dict(), 'histogram': self.histogram.to_dict(), 'sketch': self.sketch.to_dict()}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        return cls(
+            name,
+            RunningStats(**data['stats']),
+            FixedHistogram(**data['histogram']),
+            QuantileSketch.from_dict(data['sketch']),
+        )
+
+
+def _number(value):
+    # Biomarkers are stored either as plain numbers or as {value, unit, status, normalRange}
+    if isinstance(value, dict):
+        value = value.get('value')
+    if isinstance(value, bool):
+        return None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def extract_risks(record):
+    """
+    Yield (disease, risk_level, risk_value) from a record's predictions blob
+
+    Handles predict_diabetes output ({riskLevel, riskValue}), per-disease maps of those,
+    and the aiAnalysis blob written by report uploads.
+    """
+    predictions = record.get('predictions') or {}
+    if isinstance(predictions, str):
+        predictions = json.loads(predictions)
+    default_disease = predictions.get('disease') or record.get('fluidType') or 'unknown'
+
+    if 'riskLevel' in predictions:
+        yield default_disease, predictions['riskLevel'], _number(predictions.get('riskValue'))
+        return
+
+    analysis = predictions.get('aiAnalysis')
+    if isinstance(analysis, dict):
+        if analysis.get('overallRiskLevel'):
+            yield f"{default_disease}:overall", analysis['overallRiskLevel'], None
+        risk_analysis = analysis.get('riskAnalysis') or {}
+        if isinstance(risk_analysis, dict):
+            for disease, risk in risk_analysis.items():
+                if isinstance(risk, dict) and risk.get('riskLevel'):
+                    yield disease, risk['riskLevel'], _number(risk.get('riskValue'))
+        return
+
+    for disease, risk in predictions.items():
+        if isinstance(risk, dict) and 'riskLevel' in risk:
+            yield disease, risk['riskLevel'], _number(risk.get('riskValue'))
+
+
+class CohortAggregates:
+    """
+    Incremental, mergeable population statistics over BiomarkerRecord exports
+
+    Every update touches a constant number of counters per biomarker, and shard summaries
+    written with to_dict() combine with merge() without revisiting any record.
+    """
+    def __init__(self):
+        self.records = 0
+        self.risk_levels = defaultdict(Counter)                         # disease -> level -> count
+        self.metrics = {}                                               # "fluid:biomarker" -> MetricAggregate
+        self.monthly = defaultdict(lambda: defaultdict(Counter))        # disease -> month -> level -> count
+        self.monthly_risk = defaultdict(dict)                           # disease -> month -> RunningStats
+
+    def _metric(self, key, name):
+        if key not in self.metrics:
+            self.metrics[key] = MetricAggregate(name)
+        return self.metrics[key]
+
+    def update(self, record):
+        self.records += 1
+        fluid = record.get('fluidType') or 'unknown'
+        month = str(record.get('createdAt') or '')[:7] or 'unknown'
+
+        biomarkers = record.get('biomarkers') or {}
+        if isinstance(biomarkers, str):
+            biomarkers = json.loads(biomarkers)
+        for name, raw in biomarkers.items():
+            value = _number(raw)
+            if value is not None:
+                self._metric(f"{fluid}:{name}", name).update(value)
+
+        for disease, level, risk_value in extract_risks(record):
+            self.risk_levels[disease][level] += 1
+            self.monthly[disease][month][level] += 1
+            if risk_value is not None:
+                self._metric(f"{disease}:riskValue", 'riskValue').update(risk_value)
+                self.monthly_risk[disease].setdefault(month, RunningStats()).update(risk_value)
+
+    def consume(self, records):
+        for record in records:
+            self.update(record)
+        return self
+
+    def merge(self, other):
+        self.records += other.records
+        for disease, levels in other.risk_levels.items():
+            self.risk_levels[disease].update(levels)
+        for key, metric in other.metrics.items():
+            if key in self.metrics:
+                self.metrics[key].merge(metric)
+            else:
+                # Copy so later updates here never leak into the other shard
+                self.metrics[key] = copy.deepcopy(metric)
+        for disease, months in other.monthly.items():
+            for month, levels in months.items():
+                self.monthly[disease][month].update(levels)
+        for disease, months in other.monthly_risk.items():
+            for month, stats in months.items():
+                self.monthly_risk[disease].setdefault(month, RunningStats()).merge(stats)
+        return self
+
+    def to_dict(self):
+        return {
+            'records': self.records,
+            'risk_levels': {d: dict(levels) for d, levels in self.risk_levels.items()},
+            'metrics': {key: metric.to_dict() for key, metric in self.metrics.items()},
+            'monthly': {d: {m: dict(levels) for m, levels in months.items()} for d, months in self.monthly.items()},
+            'monthly_risk': {d: {m: s.to_dict() for m, s in months.items()} for d, months in self.monthly_risk.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregates = cls()
+        aggregates.records = data['records']
+        for disease, levels in data['risk_levels'].items():
+            aggregates.risk_levels[disease].update(levels)
+        for key, metric in data['metrics'].items():
+            aggregates.metrics[key] = MetricAggregate.from_dict(key.split(':', 1)[-1], metric)
+        for disease, months in data['monthly'].items():
+            for month, levels in months.items():
+                aggregates.monthly[disease][month].update(levels)
+        for disease, months in data['monthly_risk'].items():
+            for month, stats in months.items():
+                aggregates.monthly_risk[disease][month] = RunningStats(**stats)
+        return aggregates
+
+    def report(self, quantiles=(0.05, 0.25, 0.5, 0.75, 0.95)):
+        """
+        Human-oriented summary: risk-level distribution, biomarker percentiles and monthly trends
+        """
+        return {
+            'records': self.records,
+            'risk_level_distribution': {
+                disease: {level: count / sum(levels.values()) for level, count in _by_risk_level(levels).items()}
+                for disease, levels in self.risk_levels.items()
+            },
+            'metrics': {
+                key: {
+                    'count': metric.stats.count,
+                    'mean': metric.stats.mean,
+                    'std': math.sqrt(metric.stats.variance),
+                    'min': metric.stats.min,
+                    'max': metric.stats.max,
+                    'percentiles': {f"p{int(q * 100)}": metric.sketch.quantile(q) for q in quantiles},
+                }
+                for key, metric in sorted(self.metrics.items())
+            },
+            'monthly_trends': {
+                disease: {
+                    month: {
+                        'records': sum(self.monthly[disease][month].values()),
+                        'risk_levels': _by_risk_level(self.monthly[disease][month]),
+                        'mean_risk_value': self.monthly_risk[disease][month].mean
+                        if month in self.monthly_risk[disease] else None,
+                    }
+                    for month in sorted(months)
+                }
+                for disease, months in self.monthly.items()
+            },
+        }
+
+
+def read_records(path):
+    """
+    Stream records from a JSONL export (one record per line); '-' reads stdin
+    """
+    stream = sys.stdin if path == '-' else open(path)
+    try:
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
+    finally:
+        if stream is not sys.stdin:
+            stream.close()
+
+
+def load_summary(path):
+    with open(path) as f:
+        return CohortAggregates.from_dict(json.load(f))
+
+
+def save_summary(aggregates, path):
+    with open(path, 'w') as f:
+        json.dump(aggregates.to_dict(), f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming cohort analytics over BiomarkerRecord exports")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    update = sub.add_parser('update', help="Fold new records into a summary")
+    update.add_argument('records', help="JSONL export of records ('-' for stdin)")
+    update.add_argument('--summary', required=True, help="Summary JSON to update (created if missing)")
+
+    merge = sub.add_parser('merge', help="Combine shard summaries")
+    merge.add_argument('summaries', nargs='+')
+    merge.add_argument('--output', required=True)
+
+    report = sub.add_parser('report', help="Print distributions, percentiles and trends")
+    report.add_argument('summary')
+
+    args = parser.parse_args()
+
+    if args.command == 'update':
+        try:
+            aggregates = load_summary(args.summary)
+        except FileNotFoundError:
+            aggregates = CohortAggregates()
+        before = aggregates.records
+        aggregates.consume(read_records(args.records))
+        save_summary(aggregates, args.summary)
+        print(f"Added {aggregates.records - before} records ({aggregates.records} total) to {args.summary}")
+    elif args.command == 'merge':
+        aggregates = CohortAggregates()
+        for path in args.summaries:
+            aggregates.merge(load_summary(path))
+        save_summary(aggregates, args.output)
+        print(f"Merged {len(args.summaries)} summaries ({aggregates.records} records) into {args.output}")
+    elif args.command == 'report':
+        print(json.dumps(load_summary(args.summary).report(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
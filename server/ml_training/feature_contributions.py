@@ -0,0 +1,110 @@
+import numpy as np
+from sklearn.ensemble import GradientBoostingClassifier
+
+
+def _path_contributions(trees, node_values, n_features):
+    """
+    Cumulative per-feature contribution from the root to every node, for each tree
+
+    Each edge parent -> child adds value[child] - value[parent] to the parent's split feature,
+    so the row for a leaf holds the full decomposition of that leaf's prediction.
+    """
+    # All trees' nodes in one array, filled one depth level at a time with a few NumPy operations
+    # per level; a Python loop over every node made this the slowest part of loading the model
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    left = np.concatenate([tree.children_left + offset for tree, offset in zip(trees, offsets)])
+    right = np.concatenate([tree.children_right + offset for tree, offset in zip(trees, offsets)])
+    feature = np.concatenate([tree.feature for tree in trees])
+    values = np.concatenate(node_values)
+    internal = np.concatenate([tree.children_left != -1 for tree in trees])
+
+    # The change each node makes to its parent's split feature
+    nodes = np.flatnonzero(internal)
+    children, parents = np.concatenate([left[nodes], right[nodes]]), np.concatenate([nodes, nodes])
+    step = np.zeros(len(values), dtype=np.float64)
+    step[children] = values[children] - values[parents]
+    step_feature = np.full(len(values), -1)
+    step_feature[children] = feature[parents]
+
+    levels = []
+    parents = offsets[:-1]
+    while len(parents):
+        parents = parents[internal[parents]]
+        children = np.concatenate([left[parents], right[parents]])
+        levels.append((children, np.concatenate([parents, parents])))
+        parents = children
+
+    table = np.empty((len(values), n_features), dtype=np.float64)
+    for f in range(n_features):
+        column = np.zeros(len(values), dtype=np.float64)
+        column_step = np.where(step_feature == f, step, 0.0)
+        for children, parents in levels:
+            column[children] = column[parents] + column_step[children]
+        table[:, f] = column
+    return np.split(table, offsets[1:-1])
+
+
+def build_contribution_tables(model):
+    """
+    Precompute node-level contribution tables for a fitted tree ensemble
+
+    Args:
+        model: Fitted RandomForestClassifier or binary GradientBoostingClassifier
+
+    Returns:
+        dict with the per-tree tables, the model's bias term and the output units
+    """
+    n_features = model.n_features_in_
+
+    if isinstance(model, GradientBoostingClassifier):
+        # Binary boosting sums regression trees in log-odds space
+        trees = [est.tree_ for est in model.estimators_[:, 0]]
+        scale = model.learning_rate
+        values = [tree.value[:, 0, 0] * scale for tree in trees]
+        units = 'log_odds'
+        bias = None  # depends on the init estimator; recovered from decision_function
+    else:
+        # Forests average class-1 probabilities over trees
+        trees = [est.tree_ for est in model.estimators_]
+        positive = list(model.classes_).index(1) if 1 in model.classes_ else len(model.classes_) - 1
+        values = []
+        for tree in trees:
+            counts = tree.value[:, 0, :]
+            values.append(counts[:, positive] / counts.sum(axis=1))
+        scale = 1.0 / len(trees)
+        values = [v * scale for v in values]
+        units = 'probability'
+        bias = float(sum(v[0] for v in values))
+
+    return {
+        'trees': trees,
+        'tables': _path_contributions(trees, values, n_features),
+        'bias': bias,
+        'units': units,
+        'model': model,
+    }
+
+
+def feature_contributions(tables, X_scaled):
+    """
+    Per-row feature contributions for a batch of already scaled inputs
+
+    Args:
+        tables (dict): Output of build_contribution_tables
+        X_scaled (ndarray): Scaled features, shape (n_rows, n_features)
+
+    Returns:
+        (bias, contributions): bias has shape (n_rows,), contributions (n_rows, n_features);
+        bias + contributions.sum(axis=1) equals the model's class-1 probability (forests)
+        or decision function (boosting)
+    """
+    X32 = np.ascontiguousarray(X_scaled, dtype=np.float32)
+    contributions = np.zeros((X32.shape[0], X32.shape[1]), dtype=np.float64)
+    for tree, table in zip(tables['trees'], tables['tables']):
+        contributions += table[tree.apply(X32)]
+
+    if tables['bias'] is None:
+        bias = tables['model'].decision_function(X_scaled) - contributions.sum(axis=1)
+    else:
+        bias = np.full(X32.shape[0], tables['bias'])
+    return bias, contributions
@@ -0,0 +1,255 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+
+from benchmark import DEFAULT_DATA_PATH, FEATURE_NAMES, load_feature_frame
+from test_prediction import TEST_CASES
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def build_payloads(n_requests, data_path=DEFAULT_DATA_PATH, invalid_ratio=0.05, seed=42):
+    """
+    Synthesize a request mix from the hand-written test cases, real dataset rows and invalid panels
+
+    Args:
+        n_requests (int): Number of payloads to generate
+        data_path (str): Path to diabetes_data.csv
+        invalid_ratio (float): Fraction of payloads that should be rejected by the scorer
+        seed (int): Random seed so repeated runs replay the same mix
+    """
+    rng = np.random.default_rng(seed)
+    rows = load_feature_frame(data_path)[FEATURE_NAMES].to_dict('records')
+    cases = list(TEST_CASES.values())
+
+    payloads = []
+    for _ in range(n_requests):
+        roll = rng.random()
+        if roll < invalid_ratio:
+            payload = dict(rows[rng.integers(len(rows))])
+            if rng.random() < 0.5:
+                del payload[FEATURE_NAMES[rng.integers(len(FEATURE_NAMES))]]
+            else:
+                payload[FEATURE_NAMES[rng.integers(len(FEATURE_NAMES))]] = "n/a"
+            payloads.append({'kind': 'invalid', 'body': payload})
+        elif roll < invalid_ratio + 0.1:
+            payloads.append({'kind': 'test_case', 'body': dict(cases[rng.integers(len(cases))])})
+        else:
+            payloads.append({'kind': 'dataset', 'body': dict(rows[rng.integers(len(rows))])})
+    return payloads
+
+
+def load_replay_file(path):
+    # One JSON biomarker panel per line, as captured from request logs
+    payloads = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                payloads.append({'kind': 'replay', 'body': json.loads(line)})
+    return payloads
+
+
+def _warm_worker():
+    from predict_diabetes import warmup
+    warmup()
+
+
+def _score_in_worker(body):
+    from predict_diabetes import predict_diabetes
+    return predict_diabetes(body)
+
+
+def make_sender(args):
+    """
+    Build a blocking send(body) callable for the selected target mode
+
+    Args:
+        args (Namespace): Parsed command line arguments
+    """
+    if args.mode == 'subprocess':
+        script = os.path.join(BASE_DIR, 'predict_diabetes.py')
+
+        def send(body):
+            proc = subprocess.run(
+                [sys.executable, script],
+                input=json.dumps(body), capture_output=True, text=True, timeout=args.timeout
+            )
+            if proc.returncode != 0:
+                raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "non-zero exit")
+            return json.loads(proc.stdout)
+        return send, None
+
+    if args.mode == 'worker':
+        pool = ProcessPoolExecutor(max_workers=args.workers, initializer=_warm_worker)
+
+        def send(body):
+            return pool.submit(_score_in_worker, body).result(timeout=args.timeout)
+        return send, pool
+
+    headers = {'Content-Type': 'application/json'}
+    for header in args.header:
+        key, value = header.split(':', 1)
+        headers[key.strip()] = value.strip()
+
+    def send(body):
+        request = urllib.request.Request(
+            args.url, data=json.dumps(body).encode('utf-8'), headers=headers, method='POST'
+        )
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            return json.loads(response.read())
+    return send, None
+
+
+def arrival_offsets(n_requests, rate, burst_size, seed=42):
+    """
+    Schedule send times for an open-loop run: Poisson arrivals of bursts at the target rate
+
+    Args:
+        n_requests (int): Number of requests to schedule
+        rate (float): Target requests per second
+        burst_size (int): Number of requests that arrive together in each burst
+        seed (int): Random seed
+    """
+    rng = np.random.default_rng(seed)
+    n_bursts = -(-n_requests // burst_size)
+    gaps = rng.exponential(burst_size / rate, size=n_bursts)
+    burst_starts = np.cumsum(gaps) - gaps[0]
+    return np.repeat(burst_starts, burst_size)[:n_requests]
+
+
+def run_load(payloads, send, concurrency, rate=None, burst_size=1):
+    """
+    Drive the scorer and record one (kind, latency_ms, ok, error) tuple per request
+
+    With a rate, requests are sent open-loop and latency is measured from the scheduled
+    send time, so queueing behind a slow scorer is counted. Without a rate, `concurrency`
+    requests are kept in flight back to back.
+    """
+    records = []
+    lock = threading.Lock()
+    offsets = arrival_offsets(len(payloads), rate, burst_size) if rate else None
+
+    def fire(payload, scheduled):
+        ok, error = True, None
+        try:
+            send(payload['body'])
+        except Exception as e:
+            ok, error = False, f"{type(e).__name__}: {str(e)}"
+        latency = (time.perf_counter() - scheduled) * 1000
+        with lock:
+            records.append((payload['kind'], latency, ok, error))
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for i, payload in enumerate(payloads):
+            if offsets is not None:
+                scheduled = start + offsets[i]
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            else:
+                scheduled = None
+            executor.submit(lambda p=payload, s=scheduled: fire(p, s if s is not None else time.perf_counter()))
+    elapsed = time.perf_counter() - start
+    return records, elapsed
+
+
+def summarize_run(records, elapsed):
+    latencies = np.array([r[1] for r in records])
+    ok = np.array([r[2] for r in records])
+    kinds = sorted(set(r[0] for r in records))
+    errors = {}
+    for _, _, success, error in records:
+        if not success:
+            errors[error] = errors.get(error, 0) + 1
+
+    def percentiles(values):
+        if len(values) == 0:
+            return {}
+        return {
+            'p50_ms': float(np.percentile(values, 50)),
+            'p95_ms': float(np.percentile(values, 95)),
+            'p99_ms': float(np.percentile(values, 99)),
+            'max_ms': float(values.max()),
+        }
+
+    return {
+        'requests': len(records),
+        'duration_s': elapsed,
+        'throughput_rps': int(ok.sum()) / elapsed if elapsed else 0.0,
+        'error_rate': float(1 - ok.mean()) if len(ok) else 0.0,
+        'latency': percentiles(latencies[ok]),
+        'by_kind': {
+            kind: {
+                'requests': int(sum(1 for r in records if r[0] == kind)),
+                'error_rate': float(1 - np.mean([r[2] for r in records if r[0] == kind])),
+            }
+            for kind in kinds
+        },
+        'top_errors': dict(sorted(errors.items(), key=lambda item: -item[1])[:5]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay biomarker panels against the diabetes scorer under load")
+    parser.add_argument('--mode', choices=['subprocess', 'worker', 'server'], default='worker',
+                        help="subprocess: one predict_diabetes.py per request; worker: long-lived process pool; server: HTTP POST")
+    parser.add_argument('--url', help="Endpoint for server mode, e.g. http://localhost:5000/api/predictions/blood")
+    parser.add_argument('--header', action='append', default=[], help="Extra HTTP header for server mode ('Name: value')")
+    parser.add_argument('--requests', type=int, default=500, help="Number of requests to send")
+    parser.add_argument('--concurrency', type=int, default=16, help="Maximum requests in flight")
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help="Process pool size for worker mode")
+    parser.add_argument('--rate', type=float, help="Target arrival rate in requests/sec (open loop); omit for closed loop")
+    parser.add_argument('--burst-size', type=int, default=1, help="Requests arriving together per burst at the target rate")
+    parser.add_argument('--invalid-ratio', type=float, default=0.05, help="Fraction of synthesized payloads that are invalid")
+    parser.add_argument('--replay', help="JSONL file of captured payloads to replay instead of synthesizing")
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Path to diabetes_data.csv")
+    parser.add_argument('--timeout', type=float, default=30, help="Per-request timeout in seconds")
+    parser.add_argument('--output', help="Write the JSON report to this path")
+    args = parser.parse_args()
+
+    if args.mode == 'server' and not args.url:
+        parser.error("--url is required in server mode")
+
+    if args.replay:
+        payloads = load_replay_file(args.replay)[:args.requests]
+    else:
+        payloads = build_payloads(args.requests, args.data, args.invalid_ratio)
+
+    send, pool = make_sender(args)
+    try:
+        if pool is not None:
+            # Start (and warm) the workers before the clock runs so the first requests don't pay for it
+            list(pool.map(_score_in_worker, [p['body'] for p in payloads if p['kind'] != 'invalid'][:args.workers]))
+        records, elapsed = run_load(payloads, send, args.concurrency, args.rate, args.burst_size)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    report = summarize_run(records, elapsed)
+    report['config'] = {
+        'mode': args.mode,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'burst_size': args.burst_size,
+        'source': args.replay or 'synthesized',
+    }
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,117 @@
+import hashlib
 import json
 import sys
 import numpy as np
 import joblib
 import os
+import time
+from functools import lru_cache
 
+from feature_contributions import build_contribution_tables, feature_contributions
+from resource_governor import apply_resource_limits, current_rss_mb
+
+FEATURE_NAMES = ['BMI', 'Chol', 'TG', 'HDL', 'LDL', 'Cr', 'BUN']
+MODEL_DIR = os.path.join(os.path.dirname(__file__), 'models')
+WARMUP_BATCH_SIZES = (1, 32, 1024)
+
+# Filled in as artifacts load and warm up; reported by readiness()
+_status = {'ready': False, 'models': {}}
+
+# ShadowScorer for a candidate model, False when shadow mode is off, None until first checked
+_shadow = None
+
+@lru_cache(maxsize=1)
 def load_model_and_scaler():
     try:
-        model_dir = os.path.join(os.path.dirname(__file__), 'models')
-        model = joblib.load(os.path.join(model_dir, 'diabetes_model.joblib'))
-        scaler = joblib.load(os.path.join(model_dir, 'diabetes_scaler.joblib'))
+        for name in ['diabetes_model', 'diabetes_scaler']:
+            path = os.path.join(MODEL_DIR, f'{name}.joblib')
+            rss_before = current_rss_mb()
+            start = time.perf_counter()
+            artifact = joblib.load(path)
+            _status['models'][name] = {
+                'file': os.path.basename(path),
+                'modified': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(os.path.getmtime(path))),
+                'load_ms': (time.perf_counter() - start) * 1000,
+                'rss_mb': current_rss_mb() - rss_before,
+            }
+            if name == 'diabetes_model':
+                model = artifact
+            else:
+                scaler = artifact
+        _status['models']['diabetes_model']['n_estimators'] = len(getattr(model, 'estimators_', []))
         return model, scaler
     except Exception as e:
         print(f"Error loading model: {str(e)}", file=sys.stderr)
         raise
 
+@lru_cache(maxsize=4)
+def load_contribution_tables(model):
+    # Built once per loaded model so each prediction only needs a leaf lookup per tree
+    tables = build_contribution_tables(model)
+    _status['models']['contribution_tables'] = {
+        'table_mb': sum(table.nbytes for table in tables['tables']) / 2**20,
+    }
+    return tables
+
+def artifact_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def model_version():
+    """
+    Version of the model artifact being served, matched by content against models/manifest.json
+
+    Plain trained artifacts with no manifest are version 0; None means the served file isn't
+    any version the manifest knows (e.g. retrained after the last update).
+    """
+    manifest_path = os.path.join(MODEL_DIR, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return 0
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    loaded = artifact_sha256(os.path.join(MODEL_DIR, 'diabetes_model.joblib'))
+    return next((v['version'] for v in manifest['versions'] if v.get('model_sha256') == loaded), None)
+
+def warmup(batch_sizes=WARMUP_BATCH_SIZES):
+    """
+    Load every artifact and push synthetic batches through each scoring step, so the first real
+    request doesn't pay for lazy imports, page faults on the forest or cold caches
+    """
+    start = time.perf_counter()
+    model, scaler = load_model_and_scaler()
+    tables = load_contribution_tables(model)
+
+    # Draw inputs around the training distribution the scaler was fitted on
+    rng = np.random.default_rng(0)
+    batch_ms = {}
+    for size in batch_sizes:
+        X = scaler.mean_ + rng.standard_normal((size, len(FEATURE_NAMES))) * scaler.scale_
+        batch_start = time.perf_counter()
+        X_scaled = scaler.transform(X)
+        model.predict_proba(X_scaled)
+        feature_contributions(tables, X_scaled)
+        batch_ms[str(size)] = (time.perf_counter() - batch_start) * 1000
+    score_batch([dict(zip(FEATURE_NAMES, X[0].tolist()))])
+    # Start the shadow candidate's worker too, rather than on the first real request
+    shadow = get_shadow_scorer()
+    if shadow is not None:
+        shadow.start()
+
+    _status.update({
+        'ready': True,
+        'version': model_version(),
+        'warmup_ms': (time.perf_counter() - start) * 1000,
+        'warmup_batch_ms': batch_ms,
+        'rss_mb': current_rss_mb(),
+    })
+    return readiness()
+
+def readiness():
+    return json.loads(json.dumps(_status))
+
 def analyze_biomarkers(features):
     issues = []
     risk_factors = 0
@@ -78,136 +176,223 @@ def analyze_biomarkers(features):
 
     return issues, risk_factors
 
-def predict_diabetes(features):
-    try:
+def score_batch(rows, model=None, scaler=None):
+    """
+    Score a list of biomarker panels with one vectorized pass through the model
+
+    Args:
+        rows (list): Feature dicts with the keys in FEATURE_NAMES
+        model: Forest to score with (defaults to the production artifact)
+        scaler: Scaler matching the model (defaults to the production artifact)
+    """
+    if model is None or scaler is None:
         model, scaler = load_model_and_scaler()
 
-        feature_names = ['BMI', 'Chol', 'TG', 'HDL', 'LDL', 'Cr', 'BUN']
-        X = np.array([[features[name] for name in feature_names]])
+    X = np.array([[features[name] for name in FEATURE_NAMES] for features in rows])
 
-        X_scaled = scaler.transform(X)
-        prediction = model.predict(X_scaled)
-        probability = model.predict_proba(X_scaled)[0]
+    X_scaled = scaler.transform(X)
+    probabilities = model.predict_proba(X_scaled)
 
-        biomarker_issues, risk_factors = analyze_biomarkers(features)
-        
-        # Calculate risk based on individual parameters
-        parameter_risks = []
+    # Per-patient attribution of the model probability, in risk points
+    bias, contributions = feature_contributions(load_contribution_tables(model), X_scaled)
+
+    return [
+        build_result(features, probabilities[i], bias[i], contributions[i])
+        for i, features in enumerate(rows)
+    ]
+
+def timed_score_batch(rows, model, scaler):
+    """
+    score_batch plus the wall-clock latency and thread CPU time of that pass, in milliseconds
+
+    Latency includes page-fault, I/O and BLAS/OpenMP worker waits; CPU time is this thread's only.
+    """
+    wall_start, cpu_start = time.perf_counter(), time.thread_time()
+    results = score_batch(rows, model, scaler)
+    return results, {
+        'latency_ms': (time.perf_counter() - wall_start) * 1000,
+        'cpu_ms': (time.thread_time() - cpu_start) * 1000,
+    }
+
+def build_result(features, probability, bias, contributions):
+    biomarker_issues, risk_factors = analyze_biomarkers(features)
+    
+    # Calculate risk based on individual parameters
+    parameter_risks = []
+    
+    # BMI risk (0-25 points)
+    if features['BMI'] > 30:
+        parameter_risks.append(25)  # Severe obesity
+    elif features['BMI'] > 25:
+        parameter_risks.append(20)  # Overweight
+    elif features['BMI'] < 18.5:
+        parameter_risks.append(15)  # Underweight
         
-        # BMI risk (0-25 points)
-        if features['BMI'] > 30:
-            parameter_risks.append(25)  # Severe obesity
-        elif features['BMI'] > 25:
-            parameter_risks.append(20)  # Overweight
-        elif features['BMI'] < 18.5:
-            parameter_risks.append(15)  # Underweight
-            
-        # Cholesterol risk (0-20 points)
-        if features['Chol'] > 5.2:
-            parameter_risks.append(20)  # Very high cholesterol
-        elif features['Chol'] > 4.0:
-            parameter_risks.append(15)  # High cholesterol
-            
-        # Triglycerides risk (0-20 points)
-        if features['TG'] > 2.0:
-            parameter_risks.append(20)  # Very high triglycerides
-        elif features['TG'] > 1.3:
-            parameter_risks.append(15)  # High triglycerides
-            
-        # HDL risk (0-20 points)
-        if features['HDL'] < 1.0:
-            parameter_risks.append(20)  # Very low HDL
-        elif features['HDL'] < 1.3:
-            parameter_risks.append(15)  # Low HDL
-            
-        # LDL risk (0-20 points)
-        if features['LDL'] > 3.4:
-            parameter_risks.append(20)  # Very high LDL
-        elif features['LDL'] > 2.0:
-            parameter_risks.append(15)  # High LDL
-            
-        # Kidney function risk (0-25 points)
-        if features['Cr'] > 106 or features['BUN'] > 7.1:
-            parameter_risks.append(25)  # Severe kidney impairment
-        elif features['Cr'] > 90 or features['BUN'] > 6.5:
-            parameter_risks.append(20)  # Moderate kidney impairment
-            
-        # Calculate total risk from parameters
-        parameter_risk = sum(parameter_risks)
+    # Cholesterol risk (0-20 points)
+    if features['Chol'] > 5.2:
+        parameter_risks.append(20)  # Very high cholesterol
+    elif features['Chol'] > 4.0:
+        parameter_risks.append(15)  # High cholesterol
         
-        # Add additional risk points for multiple unhealthy parameters
-        unhealthy_count = sum(1 for risk in parameter_risks if risk >= 15)
-        if unhealthy_count >= 3:
-            parameter_risk += 20  # Additional risk for multiple unhealthy parameters
+    # Triglycerides risk (0-20 points)
+    if features['TG'] > 2.0:
+        parameter_risks.append(20)  # Very high triglycerides
+    elif features['TG'] > 1.3:
+        parameter_risks.append(15)  # High triglycerides
         
-        # Calculate base risk from model prediction
-        base_risk = int(probability[1] * 100)
+    # HDL risk (0-20 points)
+    if features['HDL'] < 1.0:
+        parameter_risks.append(20)  # Very low HDL
+    elif features['HDL'] < 1.3:
+        parameter_risks.append(15)  # Low HDL
         
-        # Use the higher of the two risk calculations
-        risk_value = max(base_risk, parameter_risk)
+    # LDL risk (0-20 points)
+    if features['LDL'] > 3.4:
+        parameter_risks.append(20)  # Very high LDL
+    elif features['LDL'] > 2.0:
+        parameter_risks.append(15)  # High LDL
         
-        # Ensure minimum risk value for unhealthy parameters
-        if any(risk >= 20 for risk in parameter_risks):
-            risk_value = max(risk_value, 60)  # Minimum high risk if any parameter is very unhealthy
+    # Kidney function risk (0-25 points)
+    if features['Cr'] > 106 or features['BUN'] > 7.1:
+        parameter_risks.append(25)  # Severe kidney impairment
+    elif features['Cr'] > 90 or features['BUN'] > 6.5:
+        parameter_risks.append(20)  # Moderate kidney impairment
         
-        # Ensure risk value is between 0 and 100
-        risk_value = min(100, risk_value)
-
-        # Determine risk level based on combined risk score
-        if risk_value < 15:
-            risk_level = "Minimal"
-        elif risk_value < 35:
-            risk_level = "Low"
-        elif risk_value < 55:
-            risk_level = "Moderate"
-        elif risk_value < 75:
-            risk_level = "High"
-        else:
-            risk_level = "Very High"
-
-        # Generate recommendations based on risk level
-        if risk_level == "Minimal":
-            recommendation = "Continue maintaining your healthy lifestyle with regular check-ups."
-        elif risk_level == "Low":
-            recommendation = "Maintain current lifestyle and schedule regular health check-ups."
-        elif risk_level == "Moderate":
-            recommendation = "Consider lifestyle modifications and consult healthcare provider for preventive measures."
-        elif risk_level == "High":
-            recommendation = "Schedule an immediate consultation with your healthcare provider for comprehensive evaluation."
+    # Calculate total risk from parameters
+    parameter_risk = sum(parameter_risks)
+    
+    # Add additional risk points for multiple unhealthy parameters
+    unhealthy_count = sum(1 for risk in parameter_risks if risk >= 15)
+    if unhealthy_count >= 3:
+        parameter_risk += 20  # Additional risk for multiple unhealthy parameters
+    
+    # Calculate base risk from model prediction
+    base_risk = int(probability[1] * 100)
+    
+    # Use the higher of the two risk calculations
+    risk_value = max(base_risk, parameter_risk)
+    
+    # Ensure minimum risk value for unhealthy parameters
+    if any(risk >= 20 for risk in parameter_risks):
+        risk_value = max(risk_value, 60)  # Minimum high risk if any parameter is very unhealthy
+    
+    # Ensure risk value is between 0 and 100
+    risk_value = min(100, risk_value)
+
+    # Determine risk level based on combined risk score
+    if risk_value < 15:
+        risk_level = "Minimal"
+    elif risk_value < 35:
+        risk_level = "Low"
+    elif risk_value < 55:
+        risk_level = "Moderate"
+    elif risk_value < 75:
+        risk_level = "High"
+    else:
+        risk_level = "Very High"
+
+    # Generate recommendations based on risk level
+    if risk_level == "Minimal":
+        recommendation = "Continue maintaining your healthy lifestyle with regular check-ups."
+    elif risk_level == "Low":
+        recommendation = "Maintain current lifestyle and schedule regular health check-ups."
+    elif risk_level == "Moderate":
+        recommendation = "Consider lifestyle modifications and consult healthcare provider for preventive measures."
+    elif risk_level == "High":
+        recommendation = "Schedule an immediate consultation with your healthcare provider for comprehensive evaluation."
+    else:
+        recommendation = "Urgent medical attention required. Please consult your healthcare provider immediately."
+
+    # Determine potential diseases based on biomarker values
+    potential_diseases = []
+    if features['BMI'] >= 30:
+        potential_diseases.append("Obesity")
+    if features['Chol'] > 5.2 or features['LDL'] > 3.4:
+        potential_diseases.append("Hypercholesterolemia")
+    if features['TG'] > 1.7:
+        potential_diseases.append("Hypertriglyceridemia")
+    if features['Cr'] > 106 or features['BUN'] > 7.1:
+        potential_diseases.append("Kidney Function Impairment")
+
+    result = {
+        "riskLevel": risk_level,
+        "riskValue": risk_value,
+        "featureContributions": {
+            "baseline": round(float(bias) * 100, 2),
+            "features": {
+                name: round(float(value) * 100, 2)
+                for name, value in zip(FEATURE_NAMES, contributions)
+            }
+        },
+        "factors": biomarker_issues,
+        "recommendation": recommendation,
+        "potentialDiseases": potential_diseases
+    }
+
+    return result
+
+def get_shadow_scorer():
+    # Shadow scoring is opt-in: DIABETES_SHADOW_VERSION names a candidate version from models/manifest.json
+    global _shadow
+    if _shadow is None:
+        version = os.environ.get('DIABETES_SHADOW_VERSION')
+        if not version:
+            _shadow = False
         else:
-            recommendation = "Urgent medical attention required. Please consult your healthcare provider immediately."
-
-        # Determine potential diseases based on biomarker values
-        potential_diseases = []
-        if features['BMI'] >= 30:
-            potential_diseases.append("Obesity")
-        if features['Chol'] > 5.2 or features['LDL'] > 3.4:
-            potential_diseases.append("Hypercholesterolemia")
-        if features['TG'] > 1.7:
-            potential_diseases.append("Hypertriglyceridemia")
-        if features['Cr'] > 106 or features['BUN'] > 7.1:
-            potential_diseases.append("Kidney Function Impairment")
-
-        result = {
-            "riskLevel": risk_level,
-            "riskValue": risk_value,
-            "factors": biomarker_issues,
-            "recommendation": recommendation,
-            "potentialDiseases": potential_diseases
-        }
-
-        return result
+            try:
+                from shadow import ShadowScorer
+                _shadow = ShadowScorer.from_version(int(version))
+            except Exception as e:
+                # A broken candidate must never take the primary path down with it
+                print(f"Shadow scoring disabled: {str(e)}", file=sys.stderr)
+                _shadow = False
+    return _shadow or None
+
+def predict_diabetes_batch(rows):
+    try:
+        model, scaler = load_model_and_scaler()
+        load_contribution_tables(model)
+        # Time only the scoring pass, the same way the shadow side does, so first-call loading
+        # isn't counted
+        results, timing = timed_score_batch(rows, model, scaler)
+
+        # The candidate only ever sees a copy of the work; its result is never returned
+        shadow = get_shadow_scorer()
+        if shadow is not None:
+            shadow.submit(rows, results, timing)
+
+        return results
 
     except Exception as e:
         print(f"Error in prediction: {str(e)}", file=sys.stderr)
         raise
 
+def predict_diabetes(features):
+    return predict_diabetes_batch([features])[0]
+
 def main():
     try:
+        apply_resource_limits('scoring')
+        if '--health' in sys.argv[1:]:
+            # Warm up and report readiness instead of scoring a request
+            print(json.dumps(warmup()))
+            return
+        shadow = get_shadow_scorer()
+        if shadow is not None:
+            # One process per request: score the candidate after the response is out
+            shadow.detached = True
+
+        # A single panel, or a list of panels scored as one batch
         input_data = json.loads(sys.stdin.read())
-        result = predict_diabetes(input_data)
+        if isinstance(input_data, list):
+            result = predict_diabetes_batch(input_data)
+        else:
+            result = predict_diabetes(input_data)
         print(json.dumps(result))
 
+        if shadow is not None:
+            shadow.finish_detached()
+
     except Exception as e:
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
@@ -0,0 +1,154 @@
+import json
+import os
+import sys
+
+# Environment variables read by BLAS/OpenMP runtimes and TensorFlow when they start up
+THREAD_ENV_VARS = [
+    'OMP_NUM_THREADS',
+    'OPENBLAS_NUM_THREADS',
+    'MKL_NUM_THREADS',
+    'VECLIB_MAXIMUM_THREADS',
+    'NUMEXPR_NUM_THREADS',
+]
+
+_active_limits = {}
+
+
+def current_rss_mb():
+    """
+    Resident set size of this process in MB (peak RSS where /proc is unavailable)
+    """
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except (OSError, ValueError, AttributeError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is bytes on macOS and KB on Linux
+        return peak / 2**20 if sys.platform == 'darwin' else peak / 2**10
+
+
+def default_config():
+    total = os.cpu_count() or 1
+    scoring_threads = max(1, total // 2)
+    training_threads = max(1, total - scoring_threads)
+    return {
+        'total_threads': total,
+        'scoring': {
+            'threads': scoring_threads,
+            'n_jobs': 1,
+            'tf_intra_op_threads': scoring_threads,
+            'tf_inter_op_threads': 1,
+            'nice': 0,
+            'cpus': None,
+        },
+        'training': {
+            'threads': training_threads,
+            'n_jobs': training_threads,
+            'tf_intra_op_threads': training_threads,
+            'tf_inter_op_threads': 1,
+            'nice': 10,
+            'cpus': None,
+        },
+    }
+
+
+def load_config(path=None):
+    """
+    Load the shared resource config, falling back to defaults sized from the host's CPU count
+
+    Args:
+        path (str): JSON config file; defaults to $ML_RESOURCE_CONFIG if set
+    """
+    config = default_config()
+    path = path or os.environ.get('ML_RESOURCE_CONFIG')
+    if path:
+        with open(path) as f:
+            overrides = json.load(f)
+        for key, value in overrides.items():
+            if isinstance(value, dict) and isinstance(config.get(key), dict):
+                config[key].update(value)
+            else:
+                config[key] = value
+
+    # Never hand a single role more threads than the whole budget
+    for role in ('scoring', 'training'):
+        for key in ('threads', 'n_jobs', 'tf_intra_op_threads'):
+            config[role][key] = max(1, min(config[role][key], config['total_threads']))
+    return config
+
+
+def set_tf_threads(intra_op_threads=None, inter_op_threads=None):
+    """
+    Set TensorFlow's CPU thread pools (the single place that does)
+
+    Args:
+        intra_op_threads (int): Threads used inside a single op (0 or None keeps TF's default)
+        inter_op_threads (int): Ops that may run in parallel (0 or None keeps TF's default)
+    """
+    import tensorflow as tf
+    try:
+        if intra_op_threads:
+            tf.config.threading.set_intra_op_parallelism_threads(intra_op_threads)
+        if inter_op_threads:
+            tf.config.threading.set_inter_op_parallelism_threads(inter_op_threads)
+    except RuntimeError as e:
+        # TF only accepts thread settings before its runtime has started
+        print(f"Could not apply TensorFlow thread settings: {str(e)}", file=sys.stderr)
+
+
+def apply_resource_limits(role, config=None):
+    """
+    Apply the thread budget, priority and CPU affinity for this process
+
+    Call this early in a script's main(). Thread env vars only affect runtimes that have not
+    started yet, so already loaded BLAS/OpenMP pools are also capped via threadpoolctl.
+
+    Training runs at a lower priority than scoring and within its own thread budget, so a
+    retrain can't starve the scorers. Estimators fit with the returned 'n_jobs' should have
+    n_jobs reset to None before they are saved; otherwise the training parallelism follows
+    the artifact into the scorer.
+
+    Args:
+        role (str): 'scoring' or 'training'
+        config (dict): Resource config; loaded with load_config() if not given
+
+    Returns:
+        dict with the limits for the role (use 'n_jobs' for sklearn estimators and the
+        'tf_*' values for TensorFlow)
+    """
+    config = config or load_config()
+    limits = config[role]
+    threads = str(limits['threads'])
+
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = threads
+    os.environ['TF_NUM_INTRAOP_THREADS'] = str(limits['tf_intra_op_threads'])
+    os.environ['TF_NUM_INTEROP_THREADS'] = str(limits['tf_inter_op_threads'])
+
+    try:
+        from threadpoolctl import threadpool_limits
+        # Keep a reference so the limit stays in force for the life of the process
+        _active_limits[role] = threadpool_limits(limits=limits['threads'])
+    except ImportError:
+        print("threadpoolctl not installed; BLAS/OpenMP limits only apply to new runtimes", file=sys.stderr)
+
+    if 'tensorflow' in sys.modules:
+        set_tf_threads(limits['tf_intra_op_threads'], limits['tf_inter_op_threads'])
+
+    if limits.get('nice'):
+        try:
+            # Only lower the priority; raising it back would need extra privileges
+            current = os.nice(0)
+            if limits['nice'] > current:
+                os.nice(limits['nice'] - current)
+        except (AttributeError, OSError) as e:
+            print(f"Could not lower process priority: {str(e)}", file=sys.stderr)
+
+    if limits.get('cpus'):
+        try:
+            os.sched_setaffinity(0, set(limits['cpus']))
+        except (AttributeError, OSError) as e:
+            print(f"Could not set CPU affinity: {str(e)}", file=sys.stderr)
+
+    return limits
@@ -0,0 +1,312 @@
+import argparse
+import atexit
+import json
+import multiprocessing
+import os
+import queue
+import sys
+from collections import Counter
+
+from cohort_analytics import RunningStats
+from predict_diabetes import MODEL_DIR, load_contribution_tables, timed_score_batch
+from update_diabetes import load_manifest, load_version
+
+try:
+    import fcntl
+except ImportError:  # Windows: stats files are merged without a lock
+    fcntl = None
+
+
+TIMING_FIELDS = ('primary_ms', 'candidate_ms', 'latency_delta_ms', 'primary_cpu_ms', 'candidate_cpu_ms', 'cpu_delta_ms')
+
+
+class ShadowStats:
+    """
+    Mergeable comparison of primary vs candidate results: latency deltas and risk-level disagreement
+
+    `*_ms` fields are wall-clock milliseconds of the scoring pass; `*_cpu_ms` fields are the
+    scoring thread's CPU time. The candidate runs at the lowest priority, so on a busy host its
+    latency also counts waiting for a core, which its CPU time leaves out.
+    """
+    def __init__(self):
+        self.batches = 0
+        self.rows = 0
+        self.disagreements = 0
+        self.dropped = 0
+        self.errors = 0
+        self.transitions = Counter()            # "primary -> candidate" risk level pairs
+        self.primary_ms = RunningStats()
+        self.candidate_ms = RunningStats()
+        self.latency_delta_ms = RunningStats()  # candidate - primary, per batch
+        self.primary_cpu_ms = RunningStats()
+        self.candidate_cpu_ms = RunningStats()
+        self.cpu_delta_ms = RunningStats()      # candidate - primary, per batch
+        self.risk_value_delta = RunningStats()  # candidate - primary, per row
+
+    def record(self, primary_results, candidate_results, primary_timing, candidate_timing):
+        self.batches += 1
+        self.primary_ms.update(primary_timing['latency_ms'])
+        self.candidate_ms.update(candidate_timing['latency_ms'])
+        self.latency_delta_ms.update(candidate_timing['latency_ms'] - primary_timing['latency_ms'])
+        self.primary_cpu_ms.update(primary_timing['cpu_ms'])
+        self.candidate_cpu_ms.update(candidate_timing['cpu_ms'])
+        self.cpu_delta_ms.update(candidate_timing['cpu_ms'] - primary_timing['cpu_ms'])
+        for primary, candidate in zip(primary_results, candidate_results):
+            self.rows += 1
+            if primary['riskLevel'] != candidate['riskLevel']:
+                self.disagreements += 1
+            self.transitions[f"{primary['riskLevel']} -> {candidate['riskLevel']}"] += 1
+            self.risk_value_delta.update(candidate['riskValue'] - primary['riskValue'])
+
+    def merge(self, other):
+        for field in ('batches', 'rows', 'disagreements', 'dropped', 'errors'):
+            setattr(self, field, getattr(self, field) + getattr(other, field))
+        self.transitions.update(other.transitions)
+        for field in TIMING_FIELDS + ('risk_value_delta',):
+            getattr(self, field).merge(getattr(other, field))
+        return self
+
+    def empty(self):
+        return self.batches == 0 and self.dropped == 0 and self.errors == 0
+
+    def to_dict(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'disagreements': self.disagreements,
+            'dropped': self.dropped,
+            'errors': self.errors,
+            'transitions': dict(self.transitions),
+            'primary_ms': self.primary_ms.to_dict(),
+            'candidate_ms': self.candidate_ms.to_dict(),
+            'latency_delta_ms': self.latency_delta_ms.to_dict(),
+            'primary_cpu_ms': self.primary_cpu_ms.to_dict(),
+            'candidate_cpu_ms': self.candidate_cpu_ms.to_dict(),
+            'cpu_delta_ms': self.cpu_delta_ms.to_dict(),
+            'risk_value_delta': self.risk_value_delta.to_dict(),
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        for field in ('batches', 'rows', 'disagreements', 'dropped', 'errors'):
+            setattr(stats, field, data[field])
+        stats.transitions.update(data['transitions'])
+        for field in TIMING_FIELDS + ('risk_value_delta',):
+            setattr(stats, field, RunningStats(**data[field]))
+        return stats
+
+    def summary(self):
+        return {
+            'batches': self.batches,
+            'rows': self.rows,
+            'disagreement_rate': self.disagreements / self.rows if self.rows else 0.0,
+            'dropped_batches': self.dropped,
+            'candidate_errors': self.errors,
+            'mean_primary_ms': self.primary_ms.mean,
+            'mean_candidate_ms': self.candidate_ms.mean,
+            'mean_latency_delta_ms': self.latency_delta_ms.mean,
+            'mean_primary_cpu_ms': self.primary_cpu_ms.mean,
+            'mean_candidate_cpu_ms': self.candidate_cpu_ms.mean,
+            'mean_cpu_delta_ms': self.cpu_delta_ms.mean,
+            'mean_risk_value_delta': self.risk_value_delta.mean,
+            'transitions': dict(self.transitions.most_common()),
+        }
+
+
+def merge_stats(path, stats):
+    """
+    Merge stats into the JSON file at path (safe across processes)
+    """
+    if stats.empty():
+        return
+    with open(path, 'a+') as f:
+        if fcntl:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        f.seek(0)
+        content = f.read()
+        if content.strip():
+            stats = ShadowStats.from_dict(json.loads(content)).merge(stats)
+        f.seek(0)
+        f.truncate()
+        json.dump(stats.to_dict(), f)
+
+
+def load_candidate(version):
+    # Contribution tables are built here too, so candidate timings start from the same
+    # fully loaded state as the primary's
+    model, scaler = load_version(load_manifest(), version)
+    load_contribution_tables(model)
+    return model, scaler
+
+
+def compare(stats, model, scaler, rows, primary_results, primary_timing):
+    # Same measurement as the primary: the score_batch pass only
+    try:
+        candidate_results, candidate_timing = timed_score_batch(rows, model, scaler)
+    except Exception:
+        stats.errors += 1
+        return
+    stats.record(primary_results, candidate_results, primary_timing, candidate_timing)
+
+
+def _candidate_worker(version, stats_path, pending, save_every):
+    # Runs in its own process, so the candidate never holds the scorer's GIL, and at the lowest
+    # priority, so it only gets CPU the scorer isn't using (falling behind shows up as drops)
+    try:
+        os.nice(19)
+    except (AttributeError, OSError):
+        pass
+    try:
+        model, scaler = load_candidate(version)
+    except Exception as e:
+        print(f"Shadow candidate v{version} failed to load: {str(e)}", file=sys.stderr)
+        return
+    stats = ShadowStats()
+    while True:
+        item = pending.get()
+        if item is None:
+            break
+        compare(stats, model, scaler, *item)
+        if stats.batches >= save_every:
+            merge_stats(stats_path, stats)
+            stats = ShadowStats()
+    merge_stats(stats_path, stats)
+
+
+class ShadowScorer:
+    def __init__(self, version, stats_path, max_pending=100, save_every=100):
+        """
+        Score a candidate model version on copies of primary traffic without affecting the primary path
+
+        In a long-lived scorer the candidate runs in a separate worker process fed by a bounded
+        queue; if it falls behind, batches are dropped (and counted) rather than making the
+        caller wait. With `detached` set (one process per request), batches are held until
+        finish_detached() hands them to a forked child after the response is written.
+
+        Args:
+            version (int): Candidate version from models/manifest.json
+            stats_path (str): JSON file the comparison stats are merged into
+            max_pending (int): Batches that may wait for the candidate before new ones are dropped
+            save_every (int): Merge stats into stats_path after this many batches
+        """
+        self.version = version
+        self.name = f'v{version}'
+        self.stats_path = stats_path
+        self.max_pending = max_pending
+        self.save_every = save_every
+        self.detached = False
+        self.held = []
+        self.stats = ShadowStats()  # Drops seen on this side of the queue
+        self.pending = None
+        self.process = None
+        self.failed = False
+        atexit.register(self.close)
+
+    @classmethod
+    def from_version(cls, version, stats_path=None):
+        manifest = load_manifest()
+        if not any(v['version'] == version for v in manifest['versions']):
+            raise ValueError(f"Version {version} is not in the model manifest")
+        stats_path = stats_path or os.environ.get('DIABETES_SHADOW_STATS') or \
+            os.path.join(MODEL_DIR, f'shadow_stats_v{version}.json')
+        return cls(version, stats_path)
+
+    def start(self):
+        """
+        Start the candidate worker (no-op when detached or already running)
+        """
+        if self.detached or self.failed or self.process is not None:
+            return
+        # spawn: a fresh interpreter, rather than a fork of a process with live thread pools
+        context = multiprocessing.get_context('spawn')
+        self.pending = context.Queue(maxsize=self.max_pending)
+        process = context.Process(
+            target=_candidate_worker,
+            args=(self.version, self.stats_path, self.pending, self.save_every),
+            name=f'diabetes-shadow-{self.name}',
+            daemon=True,
+        )
+        try:
+            process.start()
+        except Exception as e:
+            # e.g. a host script without a __main__ guard; the primary path carries on regardless
+            print(f"Shadow scoring disabled: {str(e).strip()}", file=sys.stderr)
+            self.failed = True
+            return
+        self.process = process
+
+    def submit(self, rows, primary_results, primary_timing):
+        # Only what the comparison needs crosses the process boundary
+        primary = [{'riskLevel': r['riskLevel'], 'riskValue': r['riskValue']} for r in primary_results]
+        item = (list(rows), primary, primary_timing)
+        if self.detached:
+            if len(self.held) < self.max_pending:
+                self.held.append(item)
+            else:
+                self.stats.dropped += 1
+            return
+        self.start()
+        if self.process is None:
+            self.stats.dropped += 1
+            return
+        try:
+            self.pending.put_nowait(item)
+        except queue.Full:
+            self.stats.dropped += 1
+
+    def _score_held(self):
+        model, scaler = load_candidate(self.version)
+        stats, self.stats = self.stats, ShadowStats()
+        for item in self.held:
+            compare(stats, model, scaler, *item)
+        self.held = []
+        merge_stats(self.stats_path, stats)
+
+    def close(self, timeout=30):
+        if self.process is not None:
+            try:
+                self.pending.put(None, timeout=timeout)
+            except queue.Full:
+                pass
+            self.process.join(timeout)
+            self.process = None
+        if self.held:
+            self._score_held()
+        merge_stats(self.stats_path, self.stats)
+        self.stats = ShadowStats()
+
+    def finish_detached(self):
+        """
+        For one-process-per-request use, as the last thing the process does: hand held batches to
+        a forked child and exit, so the caller sees EOF as soon as the primary result is written
+        """
+        sys.stdout.flush()
+        sys.stderr.flush()
+        if not hasattr(os, 'fork'):
+            self.close()
+            return
+        if os.fork() != 0:
+            # Parent: the child owns the held work now. Skip interpreter teardown, which after
+            # a fork mostly copies shared pages just to free them
+            os._exit(0)
+        try:
+            os.setsid()
+            devnull = os.open(os.devnull, os.O_RDWR)
+            for fd in (0, 1, 2):
+                os.dup2(devnull, fd)
+            self.close()
+        finally:
+            os._exit(0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show shadow-mode comparison stats")
+    parser.add_argument('stats', help="Stats JSON written by the shadow scorer")
+    args = parser.parse_args()
+    with open(args.stats) as f:
+        print(json.dumps(ShadowStats.from_dict(json.load(f)).summary(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
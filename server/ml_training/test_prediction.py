@@ -46,10 +46,16 @@ def run_test_case(name, values):
     result = predict_diabetes(values)
     print(json.dumps(result, indent=2))
 
-# Run all test cases
-print("Testing Diabetes Prediction System")
-print("="*50)
+TEST_CASES = {
+    "Normal Values": normal_values,
+    "High Risk Values": high_risk_values,
+    "Moderate Risk Values": moderate_risk_values
+}
+
+if __name__ == "__main__":
+    # Run all test cases
+    print("Testing Diabetes Prediction System")
+    print("="*50)
 
-run_test_case("Normal Values", normal_values)
-run_test_case("High Risk Values", high_risk_values)
-run_test_case("Moderate Risk Values", moderate_risk_values) 
\ No newline at end of file
+    for name, values in TEST_CASES.items():
+        run_test_case(name, values)
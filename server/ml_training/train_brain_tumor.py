@@ -6,7 +6,11 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, classification_report
 import joblib
 
+from resource_governor import apply_resource_limits
+
 def train_brain_tumor_model():
+    limits = apply_resource_limits('training')
+
     # Load the dataset
     # Note: Replace 'brain_tumor_data.csv' with your actual data file
     try:
@@ -29,7 +33,7 @@ def train_brain_tumor_model():
     X_test_scaled = scaler.transform(X_test)
 
     # Train the model
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=limits['n_jobs'])
     model.fit(X_train_scaled, y_train)
 
     # Make predictions
@@ -41,6 +45,8 @@ def train_brain_tumor_model():
     print("\nClassification Report:")
     print(classification_report(y_test, y_pred))
 
+    model.set_params(n_jobs=None)
+
     # Save the model and scaler
     joblib.dump(model, 'brain_tumor_model.joblib')
     joblib.dump(scaler, 'brain_tumor_scaler.joblib')
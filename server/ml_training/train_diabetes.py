@@ -8,7 +8,11 @@ from sklearn.metrics import accuracy_score, classification_report
 import joblib
 import os
 
+from resource_governor import apply_resource_limits
+
 def train_diabetes_model():
+    limits = apply_resource_limits('training')
+
     # Load the dataset
     try:
         df = pd.read_csv('diabetes_data.csv')
@@ -31,7 +35,7 @@ def train_diabetes_model():
     X_test_scaled = scaler.transform(X_test)
 
     # Train the model
-    model = RandomForestClassifier(n_estimators=100, random_state=42)
+    model = RandomForestClassifier(n_estimators=100, random_state=42, n_jobs=limits['n_jobs'])
     model.fit(X_train_scaled, y_train)
 
     # Make predictions
@@ -47,6 +51,8 @@ def train_diabetes_model():
     models_dir = os.path.join(os.path.dirname(__file__), 'models')
     os.makedirs(models_dir, exist_ok=True)
 
+    model.set_params(n_jobs=None)
+
     # Save the model and scaler
     model_path = os.path.join(models_dir, 'diabetes_model.joblib')
     scaler_path = os.path.join(models_dir, 'diabetes_scaler.joblib')
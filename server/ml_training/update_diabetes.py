@@ -0,0 +1,308 @@
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import accuracy_score
+from sklearn.model_selection import train_test_split
+
+from predict_diabetes import artifact_sha256
+from resource_governor import apply_resource_limits
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELS_DIR = os.path.join(BASE_DIR, 'models')
+DEFAULT_DATA_PATH = os.path.join(BASE_DIR, '..', '..', 'diabetes_data.csv')
+INCREMENTAL_DATA_PATH = os.path.join(MODELS_DIR, 'diabetes_incremental.csv')
+MANIFEST_PATH = os.path.join(MODELS_DIR, 'manifest.json')
+FEATURES = ['BMI', 'Chol', 'TG', 'HDL', 'LDL', 'Cr', 'BUN']
+TARGET = 'Diagnosis'
+
+
+def load_manifest():
+    if os.path.exists(MANIFEST_PATH):
+        with open(MANIFEST_PATH) as f:
+            return json.load(f)
+    # The artifacts written by train_diabetes.py are treated as version 0
+    return {
+        'current': 0,
+        'versions': [{
+            'version': 0,
+            'model': 'diabetes_model.joblib',
+            'scaler': 'diabetes_scaler.joblib',
+            'source': 'train_diabetes.py',
+        }]
+    }
+
+
+def save_manifest(manifest):
+    with open(MANIFEST_PATH, 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+
+def load_version(manifest, version):
+    entry = next(v for v in manifest['versions'] if v['version'] == version)
+    model = joblib.load(os.path.join(MODELS_DIR, entry['model']))
+    scaler = joblib.load(os.path.join(MODELS_DIR, entry['scaler']))
+    return model, scaler
+
+
+def load_new_records(path):
+    """
+    Load newly labeled records from a CSV with the diabetes feature columns, or from a
+    JSONL export of BiomarkerRecord rows ({"biomarkers": {...}, "Diagnosis": 0|1})
+
+    Args:
+        path (str): Path to the CSV or JSONL file
+    """
+    if path.endswith('.jsonl'):
+        rows = []
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    row = dict(record.get('biomarkers', record))
+                    row[TARGET] = record[TARGET]
+                    rows.append(row)
+        df = pd.DataFrame(rows)
+    else:
+        df = pd.read_csv(path)
+
+    missing = [col for col in FEATURES + [TARGET] if col not in df.columns]
+    if missing:
+        raise ValueError(f"New records are missing columns: {missing}")
+    return df[FEATURES + [TARGET]].dropna()
+
+
+def remap_thresholds(model, old_scaler, new_scaler, raw_X):
+    """
+    Re-express every split threshold of an already fitted forest in the new scaler's units,
+    so existing trees split raw inputs where they did before the scaler moved
+
+    Args:
+        model (RandomForestClassifier): Fitted forest trained on old_scaler outputs
+        old_scaler (StandardScaler): Scaler the forest was trained against
+        new_scaler (StandardScaler): Updated scaler
+        raw_X (ndarray): Raw feature rows seen so far, checked to stay on the same side of each split
+    """
+    values = [np.unique(raw_X[:, f]) for f in range(raw_X.shape[1])]
+    old_scaled = [((v - old_scaler.mean_[f]) / old_scaler.scale_[f]).astype(np.float32) for f, v in enumerate(values)]
+    new_scaled = [((v - new_scaler.mean_[f]) / new_scaler.scale_[f]).astype(np.float32).astype(np.float64)
+                  for f, v in enumerate(values)]
+
+    for tree in model.estimators_:
+        feature = tree.tree_.feature
+        threshold = tree.tree_.threshold
+        for f in range(raw_X.shape[1]):
+            nodes = np.where(feature == f)[0]
+            if len(nodes) == 0:
+                continue
+            raw = threshold[nodes] * old_scaler.scale_[f] + old_scaler.mean_[f]
+            remapped = (raw - new_scaler.mean_[f]) / new_scaler.scale_[f]
+
+            # Trees compare float32 inputs with `<=`, and a fitted threshold can sit within one
+            # float32 step of a training value, so rounding can move a known value across the
+            # remapped split. Nudge only those thresholds, just far enough to put it back.
+            n_left = np.searchsorted(old_scaled[f], threshold[nodes], side='right')
+            last_left = new_scaled[f][np.clip(n_left - 1, 0, len(values[f]) - 1)]
+            first_right = new_scaled[f][np.clip(n_left, 0, len(values[f]) - 1)]
+            remapped = np.where(n_left > 0, np.maximum(remapped, last_left), remapped)
+            remapped = np.where(n_left < len(values[f]),
+                                np.minimum(remapped, np.nextafter(first_right, -np.inf)), remapped)
+            threshold[nodes] = remapped
+
+
+def snapshot_base_version(manifest):
+    """
+    Give entries that still point at the production artifacts (the base version from
+    train_diabetes.py) their own copies, so promoting a later version doesn't overwrite them
+
+    Args:
+        manifest (dict): Manifest from load_manifest(), updated in place
+    """
+    production_sha256 = artifact_sha256(os.path.join(MODELS_DIR, 'diabetes_model.joblib'))
+    for entry in manifest['versions']:
+        if entry['model'] != 'diabetes_model.joblib':
+            continue
+        if entry.get('model_sha256', production_sha256) != production_sha256:
+            # A later version was promoted over it before snapshots existed; nothing left to copy
+            print(f"Warning: version {entry['version']} artifacts were overwritten by a promotion",
+                  file=sys.stderr)
+            continue
+        version = entry['version']
+        for key, name in (('model', 'diabetes_model'), ('scaler', 'diabetes_scaler')):
+            copy_path = f'{name}_v{version}.joblib'
+            shutil.copyfile(os.path.join(MODELS_DIR, entry[key]), os.path.join(MODELS_DIR, copy_path))
+            entry[key] = copy_path
+        entry['model_sha256'] = production_sha256
+
+
+def check_drift(new_X, scaler, threshold):
+    """
+    Standardized mean shift of each feature in the new rows relative to the scaler's statistics
+
+    Args:
+        new_X (ndarray): Raw feature values of the new records
+        scaler (StandardScaler): Scaler fitted on the data seen so far
+        threshold (float): Shift (in standard deviations) above which a feature is flagged
+    """
+    shift = (new_X.mean(axis=0) - scaler.mean_) / scaler.scale_
+    report = {name: float(value) for name, value in zip(FEATURES, shift)}
+    drifted = [name for name, value in report.items() if abs(value) > threshold]
+    return report, drifted
+
+
+def update_diabetes_model(new_data_path, data_path=DEFAULT_DATA_PATH, new_trees=20, max_trees=None,
+                          history_ratio=1.0, max_accuracy_drop=0.02, drift_threshold=0.5, promote=False,
+                          n_jobs=None):
+    """
+    Grow the current diabetes forest with trees fit on newly labeled records
+
+    Args:
+        new_data_path (str): CSV or JSONL file with newly labeled records
+        data_path (str): Original diabetes_data.csv; its test split is the held-out set
+        new_trees (int): Number of warm-started trees to add
+        max_trees (int): If set, drop the oldest trees so the forest keeps at most this many
+        history_ratio (float): Earlier rows to mix into the new trees, as a multiple of the new rows
+        max_accuracy_drop (float): Largest held-out accuracy drop allowed before the update is rejected
+        drift_threshold (float): Standardized mean shift above which a feature is reported as drifted
+        promote (bool): Copy the new version over the production artifacts if all checks pass
+        n_jobs (int): Parallel jobs used to fit the new trees
+    """
+    start = time.perf_counter()
+    manifest = load_manifest()
+    snapshot_base_version(manifest)
+    # Fingerprint versions that predate hashing, so the scorer can tell which version it is serving
+    for existing in manifest['versions']:
+        if 'model_sha256' not in existing:
+            existing['model_sha256'] = artifact_sha256(os.path.join(MODELS_DIR, existing['model']))
+    parent = manifest['current']
+    model, scaler = load_version(manifest, parent)
+    # Untouched copies of the parent for the remap and the accuracy comparison
+    old_model, old_scaler = copy.deepcopy(model), copy.deepcopy(scaler)
+
+    new_df = load_new_records(new_data_path)
+    print(f"Loaded {len(new_df)} new labeled records")
+    missing_classes = set(model.classes_) - set(new_df[TARGET].unique())
+    if missing_classes:
+        raise ValueError(f"New records must contain every class; missing {sorted(missing_classes)}")
+
+    # Same split as train_diabetes.py so the held-out rows were never trained on
+    base_df = pd.read_csv(data_path)
+    train_df, test_df = train_test_split(base_df[FEATURES + [TARGET]], test_size=0.2, random_state=42)
+    history = [train_df]
+    if os.path.exists(INCREMENTAL_DATA_PATH):
+        history.append(pd.read_csv(INCREMENTAL_DATA_PATH))
+    history_df = pd.concat(history, ignore_index=True)
+
+    new_X = new_df[FEATURES].to_numpy(dtype=np.float64)
+    drift, drifted = check_drift(new_X, scaler, drift_threshold)
+    if drifted:
+        print(f"Warning: feature drift detected in {drifted}")
+
+    # Update the running mean/variance, then move the existing trees into the new units
+    scaler.partial_fit(pd.DataFrame(new_X, columns=FEATURES))
+    # Only feature values are used here, so the held-out rows can help place thresholds too
+    known_X = np.vstack([
+        base_df[FEATURES].to_numpy(dtype=np.float64),
+        history_df[FEATURES].to_numpy(dtype=np.float64),
+        new_X,
+    ])
+    remap_thresholds(model, old_scaler, scaler, known_X)
+
+    n_history = min(len(history_df), int(len(new_df) * history_ratio))
+    fit_df = pd.concat([new_df, history_df.sample(n=n_history, random_state=42)], ignore_index=True)
+    model.set_params(warm_start=True, n_estimators=len(model.estimators_) + new_trees, n_jobs=n_jobs)
+    model.fit(scaler.transform(fit_df[FEATURES]), fit_df[TARGET])
+    model.set_params(warm_start=False, n_jobs=None)
+
+    if max_trees and len(model.estimators_) > max_trees:
+        # Rotate out the oldest trees
+        model.estimators_ = model.estimators_[-max_trees:]
+        model.n_estimators = max_trees
+
+    X_test, y_test = test_df[FEATURES], test_df[TARGET]
+    old_accuracy = accuracy_score(y_test, old_model.predict(old_scaler.transform(X_test)))
+    new_accuracy = accuracy_score(y_test, model.predict(scaler.transform(X_test)))
+    passed = new_accuracy >= old_accuracy - max_accuracy_drop
+
+    print("\nIncremental Update Performance:")
+    print(f"Held-out accuracy: {old_accuracy:.4f} -> {new_accuracy:.4f}")
+    print(f"Trees: {len(old_model.estimators_)} -> {len(model.estimators_)}")
+
+    version = max(v['version'] for v in manifest['versions']) + 1
+    entry = {
+        'version': version,
+        'parent': parent,
+        'model': f'diabetes_model_v{version}.joblib',
+        'scaler': f'diabetes_scaler_v{version}.joblib',
+        'source': os.path.basename(new_data_path),
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'new_records': len(new_df),
+        'n_trees': len(model.estimators_),
+        'holdout_accuracy': new_accuracy,
+        'parent_holdout_accuracy': old_accuracy,
+        'drift': drift,
+        'drifted_features': drifted,
+        'passed_checks': passed,
+        'update_seconds': time.perf_counter() - start,
+    }
+    joblib.dump(model, os.path.join(MODELS_DIR, entry['model']))
+    joblib.dump(scaler, os.path.join(MODELS_DIR, entry['scaler']))
+    entry['model_sha256'] = artifact_sha256(os.path.join(MODELS_DIR, entry['model']))
+
+    manifest['versions'].append(entry)
+    if passed:
+        manifest['current'] = version
+        # Only accepted rows become history for later updates, which branch from the accepted version
+        new_df.to_csv(INCREMENTAL_DATA_PATH, mode='a', index=False,
+                      header=not os.path.exists(INCREMENTAL_DATA_PATH))
+    else:
+        print(f"Accuracy dropped by more than {max_accuracy_drop}; version {version} kept as a candidate only")
+    save_manifest(manifest)
+    print(f"\nModel saved to: {os.path.join(MODELS_DIR, entry['model'])}")
+    print(f"Scaler saved to: {os.path.join(MODELS_DIR, entry['scaler'])}")
+
+    if promote and passed:
+        # Byte-for-byte copies, so the served model still matches this version's hash; replaced
+        # atomically so a scorer starting up never loads a half-written file
+        for name, production in ((entry['model'], 'diabetes_model.joblib'), (entry['scaler'], 'diabetes_scaler.joblib')):
+            tmp_path = os.path.join(MODELS_DIR, production + '.tmp')
+            shutil.copyfile(os.path.join(MODELS_DIR, name), tmp_path)
+            os.replace(tmp_path, os.path.join(MODELS_DIR, production))
+        print("Promoted to production artifacts")
+
+    return entry
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally update the diabetes model with newly labeled records")
+    parser.add_argument('new_data', help="CSV or JSONL file with newly labeled records")
+    parser.add_argument('--data', default=DEFAULT_DATA_PATH, help="Original diabetes_data.csv (for the held-out set)")
+    parser.add_argument('--new-trees', type=int, default=20, help="Number of trees to add")
+    parser.add_argument('--max-trees', type=int, help="Drop the oldest trees beyond this many")
+    parser.add_argument('--history-ratio', type=float, default=1.0, help="Earlier rows mixed in per new row")
+    parser.add_argument('--max-accuracy-drop', type=float, default=0.02, help="Allowed held-out accuracy drop")
+    parser.add_argument('--drift-threshold', type=float, default=0.5, help="Mean shift (in std) flagged as drift")
+    parser.add_argument('--promote', action='store_true', help="Overwrite the production artifacts if checks pass")
+    args = parser.parse_args()
+
+    limits = apply_resource_limits('training')
+    try:
+        entry = update_diabetes_model(
+            args.new_data, args.data, args.new_trees, args.max_trees, args.history_ratio,
+            args.max_accuracy_drop, args.drift_threshold, args.promote, limits['n_jobs']
+        )
+    except Exception as e:
+        print(f"Error: {str(e)}", file=sys.stderr)
+        sys.exit(1)
+    sys.exit(0 if entry['passed_checks'] else 1)
+
+
+if __name__ == "__main__":
+    main()